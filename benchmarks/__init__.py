@@ -0,0 +1,20 @@
+"""
+Benchmarks for the rendering hot path.
+
+Run from the repository root::
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+
+import os
+
+
+def setup_django(settings_module="testapp.settings"):
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+        django.setup()
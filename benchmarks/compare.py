@@ -0,0 +1,99 @@
+"""
+Compare two result files written by `benchmarks.run`.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Exits with status 1 when a benchmark got slower than the threshold (in percent).
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(before: dict, after: dict, metric="p50_ms") -> list[dict]:
+    """
+    Return the relative change of `metric` for each benchmark in both results.
+    """
+    before_results = {(r["name"], r["size"]): r for r in before["results"]}
+    rows = []
+    for result in after["results"]:
+        key = (result["name"], result["size"])
+        if key not in before_results:
+            continue
+        old = before_results[key][metric]
+        new = result[metric]
+        rows.append(
+            {
+                "name": result["name"],
+                "size": result["size"],
+                "before": old,
+                "after": new,
+                "change": (new - old) / old * 100 if old else 0.0,
+                "peak_memory_change": result["peak_memory_bytes"]
+                - before_results[key]["peak_memory_bytes"],
+            }
+        )
+    return rows
+
+
+def format_rows(rows: list[dict], threshold: float) -> str:
+    lines = [
+        "{:<44} {:<7} {:>10} {:>10} {:>9} {:>12}".format(
+            "benchmark", "size", "before", "after", "change", "peak KiB +/-"
+        )
+    ]
+    for row in rows:
+        marker = " !" if row["change"] > threshold else ""
+        lines.append(
+            "{:<44} {:<7} {:>10.3f} {:>10.3f} {:>+8.1f}% {:>+12.1f}{}".format(
+                row["name"],
+                row["size"],
+                row["before"],
+                row["after"],
+                row["change"],
+                row["peak_memory_change"] / 1024,
+                marker,
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--metric",
+        default="p50_ms",
+        choices=["mean_ms", "min_ms", "p50_ms", "p90_ms", "p99_ms"],
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percentage a benchmark may get slower before it's reported as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(
+        "before: {}\nafter:  {}\n".format(
+            before["meta"].get("commit"), after["meta"].get("commit")
+        )
+    )
+    rows = compare(before, after, metric=args.metric)
+    print(format_rows(rows, args.threshold))
+
+    regressions = [row for row in rows if row["change"] > args.threshold]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
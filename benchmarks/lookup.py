@@ -0,0 +1,123 @@
+"""
+Time template lookups on a large table, with and without the (template_type, language) index.
+
+    python -m benchmarks.lookup --rows 100000 --output lookup.json
+
+Runs against a test database created from the configured `default` database
+(use `DJANGO_SETTINGS_MODULE` to benchmark eg: PostgreSQL).
+"""
+
+import argparse
+import json
+import sys
+
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from . import setup_django
+from .run import format_results, get_meta, measure
+
+
+def fill_table(rows: int, languages: int = 10, batch_size: int = 5000):
+    from mail_editor.models import MailTemplate
+
+    body = "<p>Lorem ipsum dolor sit amet {{ name }}</p>" * 50
+    templates = (
+        MailTemplate(
+            template_type=f"type-{i // languages}",
+            language=f"l{i % languages}" if i % languages else "",
+            subject=f"Subject {i}",
+            body=body,
+            remarks="Remarks " * 50,
+        )
+        for i in range(rows)
+    )
+    batch = []
+    for template in templates:
+        batch.append(template)
+        if len(batch) >= batch_size:
+            MailTemplate.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        MailTemplate.objects.bulk_create(batch)
+
+
+def run(rows=100_000, iterations=200, warmup=10, memory_iterations=5) -> dict:
+    from mail_editor.models import MailTemplate
+
+    languages = 10
+    template_type = f"type-{rows // languages // 2}"
+
+    def lookup():
+        return MailTemplate.objects.get_for_language(template_type, "l3")
+
+    def lookup_subject():
+        return MailTemplate.objects.get_for_language(
+            template_type, "l3", only=["subject"]
+        )
+
+    # same query as get_for_language()
+    queryset = (
+        MailTemplate.objects.filter(template_type=template_type)
+        .filter(Q(language="l3") | Q(language=""))
+        .order_by("-language")[:1]
+    )
+    index = MailTemplate._meta.indexes[0]
+    size = f"{rows}_rows"
+
+    results = []
+    plans = {}
+    # the resolution cache would hide the queries
+    with override_settings(MAIL_EDITOR_RESOLUTION_CACHE=None):
+        fill_table(rows, languages)
+
+        for indexed in (True, False):
+            if not indexed:
+                with connection.schema_editor() as schema_editor:
+                    schema_editor.remove_index(MailTemplate, index)
+            suffix = "" if indexed else "[no_index]"
+            plans[f"get_for_language{suffix}"] = queryset.explain()
+
+            for name, func in [
+                ("get_for_language", lookup),
+                ("get_for_language[only_subject]", lookup_subject),
+            ]:
+                stats = measure(func, iterations, warmup, memory_iterations)
+                results.append({"name": name + suffix, "size": size, **stats})
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_index(MailTemplate, index)
+
+    return {"meta": get_meta(), "results": results, "plans": plans}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        data = run(rows=args.rows, iterations=args.iterations)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    for name, plan in data["plans"].items():
+        print(f"{name}:\n{plan}\n")
+    print(format_results(data))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"\nwritten to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
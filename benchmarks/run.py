@@ -0,0 +1,249 @@
+"""
+Time the rendering hot path on synthetic templates and write the results as JSON.
+
+    python -m benchmarks.run --sizes small medium large --output results.json
+"""
+
+import argparse
+import datetime
+import gc
+import importlib.util
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings as django_settings
+from django.test import override_settings
+
+from . import setup_django
+from .synthetic import SIZES, make_digest, make_template, write_assets
+
+
+def _render(template, context, base_url, size):
+    return lambda: template.render(context)
+
+
+def _render_subject(template, context, base_url, size):
+    return lambda: template.render_subject(context)
+
+
+def _mail_merge(substitution=True):
+    # the subject and body of one message, without the base template
+    def setup(template, context, base_url, size):
+        from mail_editor.cache import compiled_templates
+        from mail_editor.substitution import SubstitutionTemplate, render_template
+
+        compiled = []
+        for source in (template.subject, template.body):
+            tpl = compiled_templates.get(None, source)
+            if not substitution and isinstance(tpl, SubstitutionTemplate):
+                # force the Django engine
+                tpl = tpl.template
+            compiled.append(tpl)
+
+        layers = template._get_render_context(context)
+        return lambda: [render_template(tpl, layers) for tpl in compiled]
+
+    return setup
+
+
+def _digest(engine_name):
+    # a loop-heavy body with the given engine, without the base template
+    def setup(template, context, base_url, size):
+        from mail_editor.cache import compiled_templates
+        from mail_editor.engines import get_engine
+
+        source, digest_context = make_digest(size)
+        engine = get_engine(engine_name)
+        tpl = compiled_templates.get(None, source, engine)
+        layers = template._get_render_context(digest_context)
+        return lambda: engine.render(tpl, layers)
+
+    return setup
+
+
+def _process_html(**kwargs):
+    def setup(template, context, base_url, size):
+        from mail_editor.process import process_html
+
+        _subject, html = template.render(context)
+        return lambda: process_html(html, base_url, **kwargs)
+
+    return setup
+
+
+def _build_message(template, context, base_url, size):
+    return lambda: template.build_message(["to@example.com"], context)
+
+
+def _as_bytes(template, context, base_url, size):
+    message = template.build_message(["to@example.com"], context)
+    return lambda: message.message().as_bytes()
+
+
+# name -> setup(template, context, base_url, size) returning the callable to time
+CASES = {
+    "render": _render,
+    "render_subject": _render_subject,
+    "mail_merge": _mail_merge(),
+    "mail_merge[django]": _mail_merge(substitution=False),
+    "digest[django]": _digest("django"),
+    "process_html": _process_html(),
+    "process_html[no_attachments]": _process_html(extract_attachments=False),
+    "process_html[no_inline_css]": _process_html(inline_css=False),
+    "process_html[no_attachments,no_inline_css]": _process_html(
+        extract_attachments=False, inline_css=False
+    ),
+    "build_message": _build_message,
+    "as_bytes": _as_bytes,
+}
+
+# the jinja2 engine is optional
+if importlib.util.find_spec("jinja2"):
+    CASES["digest[jinja2]"] = _digest("jinja2")
+
+
+def measure(func, iterations: int, warmup: int, memory_iterations: int) -> dict:
+    for _i in range(warmup):
+        func()
+
+    timings = []
+    gc.collect()
+    for _i in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        timings.append(time.perf_counter_ns() - start)
+
+    # tracing slows everything down, so peak memory is measured in a separate run
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _i in range(memory_iterations):
+            func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "throughput": iterations / (total / 1e9) if total else None,
+        "mean_ms": statistics.fmean(timings) / 1e6,
+        "min_ms": timings[0] / 1e6,
+        "p50_ms": _percentile(timings, 50) / 1e6,
+        "p90_ms": _percentile(timings, 90) / 1e6,
+        "p99_ms": _percentile(timings, 99) / 1e6,
+        "max_ms": timings[-1] / 1e6,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _percentile(values: list, percent: float) -> float:
+    # nearest-rank on sorted values
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run(
+    sizes=("small", "medium", "large"),
+    cases=None,
+    iterations=100,
+    warmup=10,
+    memory_iterations=5,
+) -> dict:
+    base_url = django_settings.MAIL_EDITOR_BASE_HOST
+    results = []
+    with tempfile.TemporaryDirectory() as static_root:
+        with override_settings(STATIC_ROOT=static_root):
+            for size_name in sizes:
+                size = SIZES[size_name]
+                write_assets(static_root, size)
+                template, context = make_template(size)
+
+                for name, setup in CASES.items():
+                    if cases and name not in cases:
+                        continue
+                    func = setup(template, context, base_url, size)
+                    stats = measure(func, iterations, warmup, memory_iterations)
+                    results.append({"name": name, "size": size_name, **stats})
+
+    return {"meta": get_meta(), "results": results}
+
+
+def get_meta() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+    }
+
+
+def format_results(data: dict) -> str:
+    lines = [
+        "{:<44} {:<7} {:>10} {:>9} {:>9} {:>9} {:>10}".format(
+            "benchmark", "size", "ops/s", "p50 ms", "p90 ms", "p99 ms", "peak KiB"
+        )
+    ]
+    for result in data["results"]:
+        lines.append(
+            "{:<44} {:<7} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f} {:>10.1f}".format(
+                result["name"],
+                result["size"],
+                result["throughput"] or 0,
+                result["p50_ms"],
+                result["p90_ms"],
+                result["p99_ms"],
+                result["peak_memory_bytes"] / 1024,
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--memory-iterations", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    data = run(
+        sizes=args.sizes,
+        cases=args.cases,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        memory_iterations=args.memory_iterations,
+    )
+    print(format_results(data))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"\nwritten to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Synthetic templates and assets of increasing size.
+"""
+
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mail_editor.models import MailTemplate
+
+
+@dataclass(frozen=True)
+class TemplateSize:
+    name: str
+    images: int
+    links: int
+    stylesheets: int
+    paragraphs: int
+    variables: int
+
+
+SIZES = {
+    size.name: size
+    for size in [
+        TemplateSize(
+            "small", images=1, links=5, stylesheets=1, paragraphs=5, variables=5
+        ),
+        TemplateSize(
+            "medium", images=5, links=25, stylesheets=2, paragraphs=50, variables=20
+        ),
+        TemplateSize(
+            "large", images=20, links=100, stylesheets=4, paragraphs=400, variables=50
+        ),
+        # ~200 KB
+        TemplateSize(
+            "newsletter",
+            images=40,
+            links=150,
+            stylesheets=2,
+            paragraphs=1100,
+            variables=50,
+        ),
+    ]
+}
+
+# assets are written to `<static root>/<ASSET_DIR>/`
+ASSET_DIR = "bench"
+
+
+def write_assets(static_root: str, size: TemplateSize):
+    """
+    Write the images and stylesheets referenced by the templates of this size.
+    """
+    directory = os.path.join(static_root, ASSET_DIR)
+    os.makedirs(directory, exist_ok=True)
+
+    for i in range(size.images):
+        path = os.path.join(directory, f"image-{i}.png")
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(make_png(64 + i * 8, 32 + i * 4, seed=i))
+
+    for i in range(size.stylesheets):
+        path = os.path.join(directory, f"style-{i}.css")
+        if not os.path.exists(path):
+            with open(path, "w") as f:
+                f.write(make_css(i, rules=50))
+
+
+def make_template(size: TemplateSize) -> tuple["MailTemplate", dict]:
+    """
+    Return an unsaved template of this size and a context for it.
+    """
+    from mail_editor.models import MailTemplate
+
+    variables = [f"var_{i}" for i in range(size.variables)]
+
+    parts = []
+    for i in range(size.stylesheets):
+        parts.append(
+            f'<link rel="stylesheet" href="/static/{ASSET_DIR}/style-{i}.css">'
+        )
+    parts.append("<h1>Hello {{ %s }},</h1>" % variables[0])
+
+    for i in range(size.paragraphs):
+        parts.append(
+            '<p class="rule-{rule}">Lorem ipsum dolor sit amet, {{{{ {var} }}}} consectetur '
+            "adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore "
+            "magna aliqua.</p>".format(rule=i % 50, var=variables[i % len(variables)])
+        )
+    for i in range(size.links):
+        parts.append(f'<p><a href="/page/{i}/?ref=mail">Link {i}</a></p>')
+    for i in range(size.images):
+        parts.append(
+            f'<p><img src="/static/{ASSET_DIR}/image-{i}.png" alt="Image {i}"></p>'
+        )
+
+    template = MailTemplate(
+        template_type="template",
+        subject="Message for {{ %s }}" % variables[0],
+        body="\n".join(parts),
+    )
+    context = {var: f"value of {var}" for var in variables}
+    return template, context
+
+
+# a loop-heavy body in the syntax shared by the Django and Jinja2 engines
+DIGEST_BODY = """<h1>Your digest, {{ name }}</h1>
+<table>
+{% for item in items %}
+<tr class="{% if item.unread %}unread{% else %}read{% endif %}">
+<td><a href="{{ item.url }}">{{ item.title }}</a></td>
+<td>{{ item.author.name }}</td>
+<td>{% for tag in item.tags %}<span>{{ tag|upper }}</span> {% endfor %}</td>
+</tr>
+{% endfor %}
+</table>
+"""
+
+
+def make_digest(size: TemplateSize) -> tuple[str, dict]:
+    """
+    Return the digest body and a context with one item per paragraph of this size.
+    """
+    items = [
+        {
+            "title": f"Item {i} <new>",
+            "url": f"/items/{i}/?ref=digest",
+            "author": {"name": f"Author {i % 10}"},
+            "tags": [f"tag-{i % 5}", f"tag-{i % 7}"],
+            "unread": i % 3 == 0,
+        }
+        for i in range(size.paragraphs)
+    ]
+    return DIGEST_BODY, {"name": "Jane", "items": items}
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    rows = b"".join(
+        b"\x00"
+        + bytes(
+            ((x * 7 + y * 13 + seed * 31 + c * 50) % 256)
+            for x in range(width)
+            for c in range(3)
+        )
+        for y in range(height)
+    )
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def make_css(seed: int, rules: int) -> str:
+    return (
+        "\n".join(
+            f".rule-{i} {{ color: #{(i * 97 + seed * 13) % 0xFFFFFF:06x}; "
+            f"margin: {i % 10}px 0; font-size: {12 + i % 6}px; }}"
+            for i in range(rules)
+        )
+        + "\na { color: #059ec2; }\np { line-height: 1.4; }\n"
+    )
@@ -6,7 +6,7 @@ from django.utils.translation import gettext_lazy as _
 
 from .forms import MailTemplateForm
 from .models import MailTemplate
-from .settings import settings
+from .registry import get_registry
 from .views import (
     TemplateBrowserPreviewView,
     TemplateEmailPreviewFormView,
@@ -91,12 +91,16 @@ class MailTemplateAdmin(admin.ModelAdmin):
         return [
             re_path(
                 r"^variables/(?P<template_type>[-\w]+)/$",
-                self.admin_site.admin_view(TemplateVariableView.as_view()),
+                self.admin_site.admin_view(
+                    TemplateVariableView.as_view(), cacheable=True
+                ),
                 name="mailtemplate_variables",
             ),
             re_path(
                 r"^preview/(?P<pk>[0-9]+)/$",
-                self.admin_site.admin_view(TemplateBrowserPreviewView.as_view()),
+                self.admin_site.admin_view(
+                    TemplateBrowserPreviewView.as_view(), cacheable=True
+                ),
                 name="mailtemplate_render",
             ),
             re_path(
@@ -114,14 +118,12 @@ class MailTemplateAdmin(admin.ModelAdmin):
         return super().formfield_for_dbfield(db_field, request, **kwargs)
 
     def get_type_display(self, obj):
-        conf = settings.TEMPLATES.get(obj.template_type)
-        return conf.get("name")
+        return get_registry().names.get(obj.template_type)
 
     get_type_display.short_description = _("Template Type")
 
     def get_description(self, obj):
-        conf = settings.TEMPLATES.get(obj.template_type)
-        return conf.get("description")
+        return get_registry().descriptions.get(obj.template_type)
 
     get_description.short_description = _("Type Description")
 
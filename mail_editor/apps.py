@@ -0,0 +1,42 @@
+import os
+import sys
+
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_delete, post_save
+
+
+class MailEditorConfig(AppConfig):
+    name = "mail_editor"
+
+    def ready(self):
+        from .settings import settings
+        from .utils import clear_site_domain
+
+        if apps.is_installed("django.contrib.sites"):
+            from django.contrib.sites.models import Site
+
+            post_save.connect(
+                clear_site_domain,
+                sender=Site,
+                dispatch_uid="mail_editor.clear_site_domain.save",
+            )
+            post_delete.connect(
+                clear_site_domain,
+                sender=Site,
+                dispatch_uid="mail_editor.clear_site_domain.delete",
+            )
+
+        if settings.WARMUP and not _is_management_command():
+            from .warmup import start_warmup
+
+            start_warmup()
+
+
+def _is_management_command() -> bool:
+    # eg: `migrate` on an empty database, or `test`, the development server does send mail
+    program = sys.argv[0]
+    if os.path.basename(program) in ("manage.py", "django-admin") or program.endswith(
+        os.path.join("django", "__main__.py")
+    ):
+        return sys.argv[1:2] != ["runserver"]
+    return False
@@ -0,0 +1,110 @@
+"""
+File attachments that are only read when the message is serialized.
+"""
+
+import base64
+import os
+import threading
+from email.mime.base import MIMEBase
+from mimetypes import guess_type
+
+from django.core.mail.message import DEFAULT_ATTACHMENT_MIME_TYPE
+
+from .cache import LRUCache
+from .settings import settings
+
+# a multiple of 57 bytes, so each chunk encodes to complete 76 character lines
+CHUNK_SIZE = 57 * 1024
+
+
+class LazyAttachment(MIMEBase):
+    """
+    Attach a file by path, it's read and base64 encoded when the message is serialized.
+
+    Pass instances in the `attachments` of `MailTemplate.build_message()` (or attach them
+    to any `EmailMessage`). The encoded content is shared by all messages attaching the
+    same (unchanged) file, within the `MAIL_EDITOR_ATTACHMENT_CACHE_SIZE` byte budget.
+    """
+
+    def __init__(self, path: str, mimetype: str = None, filename: str = None):
+        self.path = path
+        if not mimetype:
+            mimetype, _encoding = guess_type(path)
+        maintype, subtype = (mimetype or DEFAULT_ATTACHMENT_MIME_TYPE).split("/", 1)
+        super().__init__(maintype, subtype)
+        self["Content-Transfer-Encoding"] = "base64"
+
+        filename = filename or os.path.basename(path)
+        try:
+            filename.encode("ascii")
+        except UnicodeEncodeError:
+            filename = ("utf-8", "", filename)
+        self.add_header("Content-Disposition", "attachment", filename=filename)
+
+    @property
+    def _payload(self):
+        # read several times per serialization by the email generator
+        return read_encoded_file(self.path)
+
+    @_payload.setter
+    def _payload(self, value):
+        # `Message.__init__()` initializes the payload, it's always read from the file
+        if value is not None:
+            raise ValueError("The payload of a LazyAttachment can't be set")
+
+    def is_multipart(self):
+        # without reading the file
+        return False
+
+    @property
+    def size(self) -> int:
+        """
+        size of the (unencoded) file in bytes
+        """
+        return os.stat(self.path).st_size
+
+    def __repr__(self):
+        return f"<LazyAttachment {self.path!r}>"
+
+
+def _sizeof(value: str) -> int:
+    return len(value)
+
+
+_encoded_files = LRUCache(sizeof=_sizeof)
+# the last file encoded by each thread, also when it's over the byte budget
+_last_encoded = threading.local()
+
+
+def read_encoded_file(path: str) -> str:
+    """
+    Return the base64 encoded content of a file, cached by path until its mtime or size changes.
+
+    Files over `MAIL_EDITOR_ATTACHMENT_CACHE_SIZE` are only kept until the thread encodes
+    another file, so serializing a message still reads them once.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_mtime, stat.st_size)
+
+    encoded = _encoded_files.get(key)
+    if encoded is not None:
+        return encoded
+    last = getattr(_last_encoded, "file", None)
+    if last is not None and last[0] == key:
+        return last[1]
+
+    parts = []
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            parts.append(base64.encodebytes(chunk).decode("ascii"))
+    encoded = "".join(parts)
+
+    _encoded_files.max_bytes = settings.ATTACHMENT_CACHE_SIZE
+    _encoded_files.set(key, encoded)
+    _last_encoded.file = (key, encoded)
+    return encoded
+
+
+def clear_attachment_cache():
+    _encoded_files.clear()
+    _last_encoded.file = None
@@ -0,0 +1,104 @@
+"""
+Async e-mail backends used by `MailTemplate.asend_email()` and `MailTemplate.asend_mass()`.
+"""
+
+import asyncio
+import logging
+from smtplib import SMTPServerDisconnected
+
+from django.core.mail import get_connection
+from django.utils.module_loading import import_string
+
+from asgiref.sync import sync_to_async
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def send_message(connection, message, fail_silently=False) -> int:
+    """
+    Send one message over an open connection.
+
+    A message that can't be sent (eg: a refused recipient) is logged (unless
+    `fail_silently`) and counts as 0, so the caller can go on with the next one. If the
+    server closed the connection, it's reopened and the message is sent again. The error
+    of reopening it is raised, the connection can't be used for the next message either.
+    """
+    try:
+        return connection.send_messages([message]) or 0
+    except SMTPServerDisconnected:
+        # the SMTP backend keeps the closed connection, so `open()` wouldn't reconnect
+        connection.close()
+        connection.open()
+    except Exception:
+        if not fail_silently:
+            logger.exception("Message to %s could not be sent", message.to)
+        return 0
+
+    try:
+        return connection.send_messages([message]) or 0
+    except Exception:
+        if not fail_silently:
+            logger.exception("Message to %s could not be sent", message.to)
+        return 0
+
+
+class BaseAsyncEmailBackend(object):
+    def __init__(self, concurrency=None, **kwargs):
+        self.concurrency = concurrency or settings.ASYNC_CONCURRENCY
+
+    async def send_messages(self, email_messages) -> list[int]:
+        """
+        Send the messages, with at most `concurrency` in flight.
+
+        Returns the number of sent messages (0 or 1) for each message.
+        """
+        raise NotImplementedError
+
+
+class ThreadedEmailBackend(BaseAsyncEmailBackend):
+    """
+    Send through the configured (blocking) Django e-mail backend in worker threads.
+
+    Each of the `concurrency` workers opens its own connection once and sends
+    messages over it until all are sent. A message that can't be sent counts as 0,
+    like the messages left when all workers lost their connection.
+    """
+
+    def __init__(self, concurrency=None, **kwargs):
+        super().__init__(concurrency=concurrency)
+        self.connection_kwargs = kwargs
+
+    async def send_messages(self, email_messages) -> list[int]:
+        email_messages = list(email_messages)
+        results = [0] * len(email_messages)
+        pending = iter(enumerate(email_messages))
+
+        fail_silently = self.connection_kwargs.get("fail_silently", False)
+
+        async def worker():
+            connection = get_connection(**self.connection_kwargs)
+            await sync_to_async(connection.open, thread_sensitive=False)()
+            try:
+                # the iterator is only consumed from the event loop, so no locking needed
+                for i, message in pending:
+                    try:
+                        results[i] = await sync_to_async(
+                            send_message, thread_sensitive=False
+                        )(connection, message, fail_silently)
+                    except Exception:
+                        # the other workers send the rest over their own connections
+                        logger.exception("Connection lost, stopping this worker")
+                        return
+            finally:
+                await sync_to_async(connection.close, thread_sensitive=False)()
+
+        workers = min(self.concurrency, len(email_messages))
+        await asyncio.gather(*(worker() for _i in range(workers)))
+        return results
+
+
+def get_async_backend(**kwargs) -> BaseAsyncEmailBackend:
+    backend_class = import_string(settings.ASYNC_BACKEND)
+    return backend_class(**kwargs)
@@ -0,0 +1,26 @@
+class Batch(object):
+    """
+    Per-template state shared by all messages built for one batch.
+
+    The base context is computed once, and images loaded for one message are reused
+    (with their content ID) by the next. So are the values of context providers
+    with a `provider_ttl`.
+    """
+
+    def __init__(self, mail_template):
+        self.mail_template = mail_template
+        self.base_context = mail_template.get_base_context()
+        self.image_cache = dict()
+        # variable name -> (expiry, value) of providers with a `provider_ttl`
+        self.provided = dict()
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,247 @@
+"""
+Process-wide caches for the rendering hot path.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .engines import get_engine
+from .settings import settings
+
+
+def content_hash(value: str) -> str:
+    h = hashlib.sha1(usedforsecurity=False)
+    h.update(str(value).encode("utf8"))
+    return h.hexdigest()
+
+
+class LRUCache(object):
+    """
+    Small thread-safe mapping that evicts the least recently used entries once
+    it holds more than `max_entries` items or more than `max_bytes` (as measured
+    by `sizeof(value)`).
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._sizes = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                # would evict everything else and still not fit
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while (
+                self.max_entries is not None and len(self._data) > self.max_entries
+            ) or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._remove(key, default)
+
+    def _remove(self, key, default=None):
+        value = self._data.pop(key, default)
+        self.bytes -= self._sizes.pop(key, 0)
+        return value
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CompiledTemplateCache(object):
+    """
+    Compiled subject/body templates, keyed by template pk, content hash and engine.
+
+    Unsaved templates are stored under pk `None`; when such a template is saved
+    its entries are adopted under the new pk (see `invalidate()`).
+    """
+
+    def __init__(self):
+        self._cache = LRUCache()
+
+    def get(self, pk, source, engine=None):
+        """
+        Return the template compiled by the engine (the default engine if `None`).
+        """
+        if engine is None:
+            engine = get_engine()
+        key = (pk, content_hash(source), engine.name)
+        template = self._cache.get(key)
+        if template is None:
+            template = engine.compile(source)
+            self.set(pk, source, template, engine)
+        return template
+
+    def set(self, pk, source, template, engine):
+        self._cache.max_entries = settings.TEMPLATE_CACHE_SIZE
+        self._cache.set((pk, content_hash(source), engine.name), template)
+
+    def invalidate(self, pk, keep=()):
+        """
+        Drop the entries of template `pk` that don't match one of the sources in `keep`.
+        """
+        keep_hashes = {content_hash(source) for source in keep}
+        for key in self._cache.keys():
+            if key[0] == pk and key[1] not in keep_hashes:
+                self._cache.pop(key)
+
+        # adopt templates compiled before the instance had a primary key
+        for key in self._cache.keys():
+            if key[0] is None and key[1] in keep_hashes:
+                adopted = (pk, *key[1:])
+                if adopted in self._cache:
+                    continue
+                template = self._cache.get(key)
+                if template is not None:
+                    self._cache.set(adopted, template)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+compiled_templates = CompiledTemplateCache()
+
+
+@receiver(setting_changed)
+def _clear_compiled_templates(setting, **kwargs):
+    # compiled templates keep a reference to the engine they were built with
+    if setting in (
+        "TEMPLATES",
+        "MAIL_EDITOR_TEMPLATE_CACHE_SIZE",
+        "MAIL_EDITOR_JINJA2_ENVIRONMENT",
+    ):
+        compiled_templates.clear()
+
+
+class LocalResolutionCache(object):
+    """
+    Resolved `get_for_language()` lookups kept in process memory.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(max_entries=1024)
+
+    def get(self, template_type, language):
+        entry = self._cache.get((template_type, language))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return copy.copy(entry[1])
+
+    def set(self, template_type, language, value, timeout):
+        self._cache.set(
+            (template_type, language), (time.monotonic() + timeout, copy.copy(value))
+        )
+
+    def invalidate(self):
+        self._cache.clear()
+
+
+class DjangoResolutionCache(object):
+    """
+    Resolved `get_for_language()` lookups shared through one of Django's caches.
+
+    Keys contain a generation number that's bumped on invalidation, so every
+    worker using the cache sees the change.
+    """
+
+    generation_key = "mail_editor.resolution.generation"
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, template_type, language):
+        return self.cache.get(self._key(template_type, language))
+
+    def set(self, template_type, language, value, timeout):
+        self.cache.set(self._key(template_type, language), value, timeout)
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            # the generation expired or was never set
+            self.cache.set(self.generation_key, 1, timeout=None)
+
+    def _key(self, template_type, language):
+        generation = self.cache.get(self.generation_key) or 0
+        return "mail_editor.resolution.{}.{}".format(
+            generation, content_hash(f"{template_type}\0{language}")
+        )
+
+
+# marks a cached lookup that didn't find a template
+MISSING = "<missing>"
+
+_local_resolution_cache = LocalResolutionCache()
+
+
+def get_resolution_cache():
+    """
+    Return the cache configured with `MAIL_EDITOR_RESOLUTION_CACHE` or `None` if disabled.
+    """
+    alias = settings.RESOLUTION_CACHE
+    if not alias:
+        return None
+    if alias == "local":
+        return _local_resolution_cache
+    return DjangoResolutionCache(alias)
+
+
+def invalidate_resolution_cache():
+    cache = get_resolution_cache()
+    if cache is not None:
+        cache.invalidate()
+    # always clear the process cache, in case the setting changed at runtime
+    _local_resolution_cache.invalidate()
+
+
+@receiver(setting_changed)
+def _clear_resolution_cache(setting, **kwargs):
+    if setting in ("MAIL_EDITOR_RESOLUTION_CACHE", "MAIL_EDITOR_CONF"):
+        _local_resolution_cache.invalidate()
@@ -0,0 +1,221 @@
+"""
+Template engines for the subject and body of mail templates.
+
+The engine is selected with `MAIL_EDITOR_ENGINE` ("django" by default) and can be
+overridden per template type with the "engine" of its `MAIL_EDITOR_CONF` entry. An
+engine compiles the sources (cached by `compiled_templates`), renders them with a
+layered context and tells the validator and the providers which variables they use.
+
+The base template is always rendered by `MAIL_EDITOR_BASE_TEMPLATE_LOADER`.
+
+The "jinja2" engine requires Jinja2 (`pip install mail_editor[jinja2]`).
+"""
+
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Template, TemplateSyntaxError
+from django.template.base import VariableNode
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy as _
+
+from .providers import get_variable_names
+from .settings import settings
+from .substitution import compile_substitution, render_template
+
+try:
+    import jinja2
+    from jinja2 import meta, nodes
+    from jinja2.sandbox import SandboxedEnvironment
+except ImportError:
+    jinja2 = None
+
+
+class BaseEngine(object):
+    name = None
+    # raised by `compile()` for invalid sources
+    syntax_error = Exception
+
+    def compile(self, source):
+        raise NotImplementedError
+
+    def render(self, template, context) -> str:
+        """
+        Render a compiled template with a layered context (eg: a `ChainMap`).
+        """
+        raise NotImplementedError
+
+    def get_variable_names(self, template) -> frozenset:
+        """
+        Return the names of all the context variables used by a compiled template.
+        """
+        raise NotImplementedError
+
+    def get_output_variables(self, template) -> set:
+        """
+        Return the variables that are output by a compiled template, as validated against
+        the required variables. Attribute lookups may be included as "name.attr".
+        """
+        raise NotImplementedError
+
+    def format_syntax_error(self, exc) -> tuple:
+        """
+        Return the message and (highlighted) source to show for a syntax error.
+        """
+        return exc, None
+
+
+class DjangoEngine(BaseEngine):
+    """
+    The Django template engine, templates that only substitute variables are rendered
+    by substitution (see `mail_editor.substitution`).
+    """
+
+    name = "django"
+    syntax_error = TemplateSyntaxError
+
+    def compile(self, source):
+        return compile_substitution(Template(source))
+
+    def render(self, template, context) -> str:
+        return render_template(template, context)
+
+    def get_variable_names(self, template) -> frozenset:
+        return get_variable_names(template)
+
+    def get_output_variables(self, template) -> set:
+        return {
+            node.filter_expression.var.var
+            for node in template.nodelist.get_nodes_by_type(VariableNode)
+        }
+
+    def format_syntax_error(self, exc) -> tuple:
+        if hasattr(exc, "django_template_source"):
+            source = exc.django_template_source[0].source
+            pz = exc.django_template_source[1]
+            highlighted_pz = ">>>>{0}<<<<".format(source[pz[0] : pz[1]])
+            source = "{0}{1}{2}".format(
+                source[: pz[0]], highlighted_pz, source[pz[1] :]
+            )
+            return _("TemplateSyntaxError: {0}").format(exc.args[0]), source
+        elif hasattr(exc, "template_debug"):
+            return (
+                _("TemplateSyntaxError: {0}").format(exc.template_debug.get("message")),
+                "{}".format(exc.template_debug.get("during")),
+            )
+        return exc, None
+
+
+class Jinja2Template(object):
+    """
+    A compiled Jinja2 template and the variables it uses, found while compiling.
+    """
+
+    __slots__ = ("template", "source", "variable_names", "output_variables")
+
+    def __init__(self, template, source, variable_names, output_variables):
+        self.template = template
+        self.source = source
+        self.variable_names = variable_names
+        self.output_variables = output_variables
+
+
+def jinja2_environment(**options):
+    """
+    The default `MAIL_EDITOR_JINJA2_ENVIRONMENT`: sandboxed, autoescaped and, like the
+    Django engine, silent about undefined variables and their attributes.
+    """
+    options.setdefault("autoescape", True)
+    options.setdefault("undefined", jinja2.ChainableUndefined)
+    return SandboxedEnvironment(**options)
+
+
+class Jinja2Engine(BaseEngine):
+    """
+    Jinja2, with the environment returned by `MAIL_EDITOR_JINJA2_ENVIRONMENT`.
+
+    Keep the environment sandboxed, templates are edited in the admin.
+    """
+
+    name = "jinja2"
+
+    def __init__(self):
+        if jinja2 is None:
+            raise ImproperlyConfigured(
+                "The jinja2 mail template engine requires Jinja2 to be installed"
+            )
+        self.syntax_error = jinja2.TemplateSyntaxError
+        self.environment = import_string(settings.JINJA2_ENVIRONMENT)()
+
+    def compile(self, source):
+        environment = self.environment
+        ast = environment.parse(source)
+        # find the variables before the code generator gets to the tree
+        variable_names = frozenset(meta.find_undeclared_variables(ast))
+        output_variables = set()
+        for output in ast.find_all(nodes.Output):
+            for node in output.nodes:
+                if isinstance(node, nodes.Name):
+                    output_variables.add(node.name)
+                output_variables.update(name.name for name in node.find_all(nodes.Name))
+
+        template = environment.template_class.from_code(
+            environment, environment.compile(ast), environment.make_globals(None)
+        )
+        return Jinja2Template(template, source, variable_names, output_variables)
+
+    def render(self, template, context) -> str:
+        # the output is escaped by the environment
+        return mark_safe(template.template.render(context))
+
+    def get_variable_names(self, template) -> frozenset:
+        return template.variable_names
+
+    def get_output_variables(self, template) -> set:
+        return template.output_variables
+
+    def format_syntax_error(self, exc) -> tuple:
+        error = _("TemplateSyntaxError: {0}").format(exc.message)
+        source = exc.source
+        if source is None or not exc.lineno:
+            return error, None
+        lines = source.splitlines()
+        if exc.lineno <= len(lines):
+            lines[exc.lineno - 1] = ">>>>{0}<<<<".format(lines[exc.lineno - 1])
+        return error, "\n".join(lines)
+
+
+ENGINES = {
+    "django": DjangoEngine,
+    "jinja2": Jinja2Engine,
+}
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def get_engine(name=None) -> BaseEngine:
+    """
+    Return the engine with this name (or the import path to an engine class), by
+    default the one configured with `MAIL_EDITOR_ENGINE`.
+    """
+    if name is None:
+        name = settings.ENGINE
+    engine = _engines.get(name)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine_class = ENGINES.get(name) or import_string(name)
+                engine = _engines[name] = engine_class()
+    return engine
+
+
+@receiver(setting_changed)
+def _reset_engines(setting, **kwargs):
+    # the compiled templates are cleared by `mail_editor.cache`
+    if setting == "MAIL_EDITOR_JINJA2_ENVIRONMENT":
+        _engines.clear()
@@ -1,12 +1,15 @@
 import logging
 
+from django.conf import settings as django_settings
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import transaction
 from django.template import loader
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from .cache import invalidate_resolution_cache
 from .models import MailTemplate
-from .settings import settings
+from .settings import get_choices, settings
 
 try:
     from django.template.exceptions import TemplateDoesNotExist, TemplateSyntaxError
@@ -29,12 +32,10 @@ def find_template(template_name, language=None):
             },
         )
     else:
-        base_qs = MailTemplate.objects.filter(
+        template = MailTemplate.objects.filter(
             template_type=template_name, language__isnull=True
-        )
-        if base_qs.exists():
-            template = base_qs.first()
-        else:
+        ).first()
+        if template is None:
             template = MailTemplate.objects.create(
                 template_type=template_name,
                 subject=get_subject(template_name),
@@ -45,6 +46,65 @@ def find_template(template_name, language=None):
     return template
 
 
+def create_missing_templates(template_types=None, languages=None):
+    """
+    Create the templates that don't exist yet for all combinations of type and language.
+
+    Uses a single query to find the existing templates and renders the defaults once per type.
+
+    :param template_types: defaults to all configured types
+    :param languages: language codes, defaults to `settings.LANGUAGES` if there's more
+                      than one, otherwise the templates are created without a language
+    :return: the created templates
+    """
+    if template_types is None:
+        template_types = [key for key, _name in get_choices()]
+    if languages is None:
+        languages = [None]
+        if len(django_settings.LANGUAGES) > 1:
+            languages = [code for code, _name in django_settings.LANGUAGES]
+
+    existing = set(
+        MailTemplate.objects.filter(template_type__in=template_types).values_list(
+            "template_type", "language"
+        )
+    )
+
+    missing = []
+    for template_type in template_types:
+        template_languages = [
+            language
+            for language in languages
+            if (template_type, language) not in existing
+        ]
+        if not template_languages:
+            continue
+
+        subject = get_subject(template_type)
+        body = get_body(template_type)
+        base_template_path = get_base_template_path(template_type)
+        for language in template_languages:
+            missing.append(
+                MailTemplate(
+                    template_type=template_type,
+                    language=language,
+                    subject=subject,
+                    body=body,
+                    base_template_path=base_template_path,
+                )
+            )
+
+    if missing:
+        with transaction.atomic():
+            created = MailTemplate.objects.bulk_create(missing)
+        # bulk_create() doesn't send the signals that invalidate cached lookups
+        invalidate_resolution_cache()
+    else:
+        created = []
+
+    return created
+
+
 def get_subject(template_name):
     config = settings.TEMPLATES
 
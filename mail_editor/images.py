@@ -0,0 +1,220 @@
+"""
+Optional optimization of inline images, enabled with `MAIL_EDITOR_OPTIMIZE_IMAGES`.
+
+Images are downscaled to their declared `width`/`height` (or at most
+`MAIL_EDITOR_IMAGE_MAX_DIMENSION` pixels) and recompressed. Results are stored in a
+content-addressed cache on disk, so every source image is optimized once and its
+content ID stays stable between messages and processes. By default the cache is a
+directory in the system's temp dir that only the current user can access.
+
+Requires Pillow (`pip install mail_editor[images]`).
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+from stat import S_IMODE, S_ISDIR
+from typing import Optional
+
+from . import signals
+from .cache import LRUCache
+from .settings import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+# bump when the optimization changes, to invalidate the cache on disk
+VERSION = 1
+
+FORMATS = {
+    "image/jpeg": "JPEG",
+    "image/png": "PNG",
+}
+
+
+def _sizeof(value) -> int:
+    return len(value.content)
+
+
+_optimized = LRUCache(sizeof=_sizeof)
+
+
+def optimize_image(data, width=None, height=None):
+    """
+    Return a `FileData` with the optimized image, or `data` itself if it can't be made smaller.
+
+    width, height: declared dimensions from the <img> element (eg: "600" or "600px")
+    """
+    if Image is None:
+        logger.warning("MAIL_EDITOR_OPTIMIZE_IMAGES requires Pillow to be installed")
+        return data
+    if data.content_type not in FORMATS:
+        return data
+
+    box = _get_box(_parse_dimension(width), _parse_dimension(height))
+    source_hash = (
+        data.cid or hashlib.sha1(data.content, usedforsecurity=False).hexdigest()
+    )
+    key = "{}-{}x{}-q{}-v{}".format(
+        source_hash, box[0], box[1], settings.IMAGE_QUALITY, VERSION
+    )
+
+    optimized = _optimized.get(key)
+    if optimized is not None:
+        return optimized
+
+    content = _read_cached(key)
+    if content is None:
+        content = _optimize(data, box)
+        _write_cached(key, content)
+        if content:
+            logger.info(
+                "Optimized %s image from %d to %d bytes (%.0f%%)",
+                data.content_type,
+                len(data.content),
+                len(content),
+                len(content) / len(data.content) * 100,
+            )
+            signals.image_optimized.send(
+                sender=None,
+                content_type=data.content_type,
+                original_size=len(data.content),
+                optimized_size=len(content),
+            )
+
+    if content:
+        from .process import FileData, cid_for_bytes
+
+        optimized = FileData(content, data.content_type, cid_for_bytes(content))
+    else:
+        # an empty result means the original is already as small as it gets
+        optimized = data
+
+    _optimized.max_bytes = settings.IMAGE_CACHE_SIZE
+    _optimized.set(key, optimized)
+    return optimized
+
+
+def clear_optimized_images():
+    """
+    Clear the in-memory cache, the cache on disk is left as-is.
+    """
+    _optimized.clear()
+
+
+def _optimize(data, box) -> bytes:
+    try:
+        with Image.open(io.BytesIO(data.content)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > box[0] or image.height > box[1]:
+                image.thumbnail(box, Image.LANCZOS)
+
+            image_format = FORMATS[data.content_type]
+            output = io.BytesIO()
+            if image_format == "JPEG":
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(
+                    output,
+                    "JPEG",
+                    quality=settings.IMAGE_QUALITY,
+                    optimize=True,
+                    progressive=True,
+                )
+            else:
+                image.save(output, "PNG", optimize=True)
+    except Exception:
+        # we never want errors to block important mail
+        logger.exception("Image could not be optimized")
+        return b""
+
+    content = output.getvalue()
+    if len(content) >= len(data.content):
+        return b""
+    return content
+
+
+def _parse_dimension(value) -> Optional[int]:
+    # only absolute sizes, eg: "600" or "600px" but not "100%"
+    if value and (match := re.fullmatch(r"\s*(\d+)\s*(px)?\s*", value)):
+        return int(match.group(1)) or None
+    return None
+
+
+def _get_box(width, height) -> tuple[int, int]:
+    maximum = settings.IMAGE_MAX_DIMENSION
+    return min(width or maximum, maximum), min(height or maximum, maximum)
+
+
+def _get_cache_dir() -> Optional[str]:
+    """
+    Return the directory of the cache on disk, or `None` if it can't be used safely.
+    """
+    if settings.IMAGE_OPTIMIZATION_CACHE_DIR:
+        return settings.IMAGE_OPTIMIZATION_CACHE_DIR
+
+    # the temp dir is shared with other users, who must not be able to plant images
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    directory = os.path.join(
+        tempfile.gettempdir(),
+        "mail_editor_images" if uid is None else f"mail_editor_images-{uid}",
+    )
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        logger.exception("Optimized image cache directory could not be created")
+        return None
+
+    try:
+        # not following symlinks
+        stat = os.lstat(directory)
+    except OSError:
+        return None
+    if (
+        not S_ISDIR(stat.st_mode)
+        or (uid is not None and stat.st_uid != uid)
+        or S_IMODE(stat.st_mode) & 0o077
+    ):
+        logger.warning(
+            "Not using %s to cache optimized images: it should be a directory that's "
+            "only accessible by its owner, set MAIL_EDITOR_IMAGE_OPTIMIZATION_CACHE_DIR",
+            directory,
+        )
+        return None
+    return directory
+
+
+def _read_cached(key) -> Optional[bytes]:
+    directory = _get_cache_dir()
+    if directory is None:
+        return None
+    try:
+        with open(os.path.join(directory, key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_cached(key, content: bytes):
+    directory = _get_cache_dir()
+    if directory is None:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # atomic, other processes might be optimizing the same image
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(directory, key))
+    except OSError:
+        logger.exception("Optimized image could not be cached")
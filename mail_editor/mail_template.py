@@ -3,14 +3,11 @@ Defines helpers for validating e-mail templates
 """
 
 from django.core.exceptions import ValidationError
-from django.template import (  # TODO: should be able to specify engine
-    Context,
-    Template,
-    TemplateSyntaxError,
-)
-from django.template.base import VariableNode
+from django.template import Context, Template
 from django.utils.translation import gettext_lazy as _
 
+from .cache import compiled_templates
+
 
 class MailTemplateValidator(object):
 
@@ -19,6 +16,7 @@ class MailTemplateValidator(object):
     def __init__(self, template):
         self.template = template
         self.config = template.config
+        self.engine = template.engine
 
     def validate(self, field):
         if not self.config:  # can't validate
@@ -28,8 +26,10 @@ class MailTemplateValidator(object):
 
     def check_syntax_errors(self, value):
         try:
-            return Template(value)
-        except TemplateSyntaxError as exc:
+            # compile through the cache so rendering the validated template later reuses it
+            return compiled_templates.get(self.template.pk, value, self.engine)
+        except self.engine.syntax_error as exc:
+            # the error is always shown with a Django template
             error_tpl = """
                 <p>{{ error }}</p>
 
@@ -37,35 +37,17 @@ class MailTemplateValidator(object):
                     {{ source|linenumbers|linebreaks }}
                 {% endif %}
             """
-            if hasattr(exc, "django_template_source"):
-                source = exc.django_template_source[0].source
-                pz = exc.django_template_source[1]
-                highlighted_pz = ">>>>{0}<<<<".format(source[pz[0] : pz[1]])
-                source = "{0}{1}{2}".format(
-                    source[: pz[0]], highlighted_pz, source[pz[1] :]
-                )
-                _error = _("TemplateSyntaxError: {0}").format(exc.args[0])
-            elif hasattr(exc, "template_debug"):
-                _error = _("TemplateSyntaxError: {0}").format(
-                    exc.template_debug.get("message")
-                )
-                source = "{}".format(exc.template_debug.get("during"))
-            else:
-                _error = exc
-                source = None
+            _error, source = self.engine.format_syntax_error(exc)
             error = Template(error_tpl).render(
                 Context({"error": _error, "source": source})
             )
             raise ValidationError(error, code="syntax_error")
 
     def check_variables(self, template, field):
-        variables_seen = set()
+        variables_seen = self.engine.get_output_variables(template)
         required_vars = {var.name for var in self.config[field] if var.required}
         # TODO do we need to check optional_vars? the following line was here but never used
         # optional_vars = {var.name for var in self.config[field] if not var.required}
-        for node in template.nodelist.get_nodes_by_type(VariableNode):
-            var_name = node.filter_expression.var.var
-            variables_seen.add(var_name)
 
         missing_vars = required_vars - variables_seen
         if missing_vars:
@@ -116,13 +98,34 @@ class Variable(object):
 
     The name of the variable is required. By default, the variable is optionally
     present in the mail template, but this can be enforced.
+
+    The value can be computed on demand by a `provider`, see `mail_editor.providers`.
     """
 
-    def __init__(self, name, description="", required=False, example=""):
+    __slots__ = (
+        "name",
+        "description",
+        "required",
+        "example",
+        "provider",
+        "provider_ttl",
+    )
+
+    def __init__(
+        self,
+        name,
+        description="",
+        required=False,
+        example="",
+        provider=None,
+        provider_ttl=None,
+    ):
         self.name = name
         self.description = description
         self.required = required
         self.example = example
+        self.provider = provider
+        self.provider_ttl = provider_ttl
 
     def get_html_list_item(self):
         variable_string = "<li>"
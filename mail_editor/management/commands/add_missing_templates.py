@@ -1,18 +1,16 @@
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
-from ...helpers import find_template
-from ...settings import get_choices
+from ...helpers import create_missing_templates
 
 
 class Command(BaseCommand):
     help = "Create all new/missing templates (use this on every deploy)"
 
     def handle(self, *args, **options):
-        choices = get_choices()
-        for key, name in choices:
-            if len(settings.LANGUAGES) > 1:
-                for language_code, _language_name in settings.LANGUAGES:
-                    find_template(key, language_code)
-            else:
-                find_template(key)
+        created = create_missing_templates()
+
+        if options["verbosity"] >= 2:
+            for template in created:
+                self.stdout.write(f"Created {template}")
+        if options["verbosity"] >= 1:
+            self.stdout.write(f"Created {len(created)} missing template(s)")
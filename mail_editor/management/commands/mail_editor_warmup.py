@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from ...warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile all templates and cache their base templates, stylesheets and images"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-memory",
+            action="store_false",
+            dest="measure_memory",
+            help="Don't measure the memory used, which slows the warm-up down",
+        )
+
+    def handle(self, *args, **options):
+        report = warm_up(measure_memory=options["measure_memory"])
+
+        for error in report.errors:
+            self.stderr.write(f"Could not warm up {error}")
+        if options["verbosity"] >= 1:
+            self.stdout.write(str(report))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mail_editor", "0013_alter_mailtemplate_language"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mailtemplate",
+            index=models.Index(
+                fields=["template_type", "language"], name="mail_editor_type_lang_idx"
+            ),
+        ),
+    ]
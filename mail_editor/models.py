@@ -1,48 +1,145 @@
-import copy
+import itertools
 import logging
 import os
+from collections import ChainMap
+from email.mime.base import MIMEBase
 from email.mime.image import MIMEImage
 
 from django.conf import settings as django_settings
-from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.db import models
 from django.db.models import Q
-from django.template import Context, Template
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.html import strip_tags
 from django.utils.module_loading import import_string
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from asgiref.sync import sync_to_async
+
+from . import signals
+from .backends import get_async_backend, send_message
+from .batch import Batch, chunked
+from .cache import (
+    MISSING,
+    compiled_templates,
+    get_resolution_cache,
+    invalidate_resolution_cache,
+)
+from .engines import get_engine
 from .mail_template import validate_template
+from .pool import render_many
 from .process import process_html
-from .settings import get_config, settings
-from .utils import variable_help_text
+from .providers import resolve_providers
+from .registry import get_registry
+from .settings import get_choices, get_config, settings
+from .skeleton import get_skeleton, render_with_skeleton
+from .utils import get_site_domain, variable_help_text
 
 logger = logging.getLogger(__name__)
 
 
 class MailTemplateManager(models.Manager):
-    def get_for_language(self, template_type, language):
+    def get_for_language(self, template_type, language, only=None):
         """
         Returns the `MailTemplate` for the given type in the given language. If the language does not exist, it
         attempts to find and return the fallback (no language) instance.
 
+        Lookups (including misses) are cached when `MAIL_EDITOR_RESOLUTION_CACHE` is set.
+
         :param template_type:
         :param language:
+        :param only: names of the fields to load, eg: `["subject"]`, the others (like `body`) are
+                     deferred. Instances with deferred fields aren't stored in the cache.
         :return:
         """
-        mail_template = (
-            self.filter(template_type=template_type)
-            .filter(Q(language=language) | Q(language=""))
-            .order_by("-language")
-            .first()
+        started = signals.start()
+        cache = get_resolution_cache()
+        if cache is not None:
+            cached = cache.get(template_type, language)
+            if cached is not None:
+                signals.finish(
+                    started,
+                    "lookup",
+                    template_type=template_type,
+                    language=language,
+                    sender=self.model,
+                )
+                if cached == MISSING:
+                    raise MailTemplate.DoesNotExist()
+                return cached
+
+        queryset = self.filter(template_type=template_type).filter(
+            Q(language=language) | Q(language="")
+        )
+        if only:
+            queryset = queryset.only("template_type", "language", *only)
+        mail_template = queryset.order_by("-language").first()
+
+        if cache is not None and (mail_template is None or not only):
+            cache.set(
+                template_type,
+                language,
+                mail_template or MISSING,
+                settings.RESOLUTION_CACHE_TIMEOUT,
+            )
+
+        signals.finish(
+            started,
+            "lookup",
+            template_type=template_type,
+            language=language,
+            sender=self.model,
         )
         if mail_template is None:
             raise MailTemplate.DoesNotExist()
         return mail_template
 
+    async def aget_for_language(self, template_type, language, only=None):
+        """
+        Async version of `get_for_language()`.
+        """
+        return await sync_to_async(self.get_for_language)(
+            template_type, language, only=only
+        )
+
+    def preload(self, languages=None):
+        """
+        Fill the resolution cache for all configured template types and languages with a single query.
+
+        :param languages: language codes to resolve, defaults to the codes in `settings.LANGUAGES`
+        :return: the loaded templates
+        """
+        cache = get_resolution_cache()
+        templates = list(self.order_by("pk"))
+        if cache is None:
+            return templates
+
+        if languages is None:
+            languages = [code for code, _name in django_settings.LANGUAGES]
+
+        by_type = {}
+        for template in templates:
+            by_type.setdefault(template.template_type, []).append(template)
+        template_types = set(by_type) | {key for key, _name in get_choices()}
+
+        for template_type in template_types:
+            candidates = by_type.get(template_type, [])
+            for language in languages:
+                # same resolution as get_for_language(): exact language first, then the fallback
+                mail_template = next(
+                    (t for t in candidates if t.language == language), None
+                ) or next((t for t in candidates if t.language == ""), None)
+                cache.set(
+                    template_type,
+                    language,
+                    mail_template or MISSING,
+                    settings.RESOLUTION_CACHE_TIMEOUT,
+                )
+        return templates
+
 
 class MailTemplate(models.Model):
     internal_name = models.CharField(max_length=255, default="", blank=True)
@@ -74,10 +171,30 @@ class MailTemplate(models.Model):
     class Meta:
         verbose_name = _("mail template")
         verbose_name_plural = _("mail templates")
-
-    def __init__(self, *args, **kwargs):
-        super(MailTemplate, self).__init__(*args, **kwargs)
-        self.config = get_config().get(self.template_type) or dict()
+        indexes = [
+            models.Index(
+                fields=["template_type", "language"], name="mail_editor_type_lang_idx"
+            ),
+        ]
+
+    @property
+    def config(self):
+        # looked up lazily from the shared registry, unless explicitly overridden
+        config = self.__dict__.get("_config")
+        if config is None:
+            return get_config().get(self.template_type) or dict()
+        return config
+
+    @config.setter
+    def config(self, value):
+        self._config = value
+
+    @property
+    def engine(self):
+        """
+        The engine of the subject and body, see `mail_editor.engines`.
+        """
+        return get_engine(get_registry().engines.get(self.template_type))
 
     def __str__(self):
         if self.internal_name:
@@ -93,9 +210,11 @@ class MailTemplate(models.Model):
         if settings.UNIQUE_LANGUAGE_TEMPLATES:
             queryset = self.__class__.objects.filter(
                 language=self.language, template_type=self.template_type
-            ).values_list("pk", flat=True)
+            )
+            if self.pk:
+                queryset = queryset.exclude(pk=self.pk)
 
-            if queryset.exists() and not (self.pk and self.pk in queryset):
+            if queryset.exists():
                 raise ValidationError(
                     _("Mail template with this type and language already exists")
                 )
@@ -108,14 +227,24 @@ class MailTemplate(models.Model):
         self.base_template_path = get_base_template_path(self.template_type)
 
     def get_base_context(self):
-        base_context = copy.deepcopy(settings.BASE_CONTEXT)
+        """
+        Return the `MAIL_EDITOR_BASE_CONTEXT` with the `MAIL_EDITOR_DYNAMIC_CONTEXT` layered on top.
+
+        Nothing is copied, values set on the returned context end up in an empty top layer.
+        """
+        started = signals.start()
+        base_context = ChainMap(settings.BASE_CONTEXT)
         dynamic = settings.DYNAMIC_CONTEXT
         if dynamic:
-            base_context.update(dynamic())
+            base_context = base_context.new_child(dynamic())
+        # keep writes out of the setting and the dynamic context
+        base_context = base_context.new_child()
+        signals.finish(started, "base_context", template=self)
         return base_context
 
-    def get_preview_contexts(self):
-        base_context = self.get_base_context()
+    def get_preview_contexts(self, base_context=None):
+        if base_context is None:
+            base_context = self.get_base_context()
 
         def _get_context(section):
             context = {}
@@ -130,38 +259,91 @@ class MailTemplate(models.Model):
         subject = _get_context(self.config["subject"])
         return subject, body
 
-    def render(self, context, subj_context=None):
-        base_context = self.get_base_context()
+    def render(self, context, subj_context=None, batch=None):
+        """
+        Render the subject and the body, including the base template.
+        """
+        layers = self._get_render_context(context, batch)
+        subject = self._render_subject(layers, subj_context)
+        body = self._render_base_template(self._render_partial_body(layers), layers)
+        return subject, mark_safe(body)
 
-        if not subj_context:
-            subj_context = context
+    def render_subject(self, context, subj_context=None, batch=None):
+        """
+        Render only the subject, without touching the body or the base template.
+        """
+        layers = self._get_render_context(context, batch, fields=("subject",))
+        return self._render_subject(layers, subj_context)
 
-        tpl_subject = Template(self.subject)
-        tpl_body = Template(self.body)
+    def render_body(self, context, batch=None):
+        """
+        Render only the body, including the base template.
+        """
+        layers = self._get_render_context(context, batch, fields=("body",))
+        body = self._render_base_template(self._render_partial_body(layers), layers)
+        return mark_safe(body)
 
-        try:
-            current_site = get_current_site(None)
-            domain = current_site.domain
-        except Exception as e:
-            domain = ""
+    def _get_render_context(self, context, batch=None, fields=("subject", "body")):
+        """
+        Layer the context on top of the base context, for the subject, body and base template.
 
-        base_context.update(context)
-        base_context.update({"domain": domain})
+        fields: the templates that will be rendered, to resolve the providers they use
+        """
+        if batch is None:
+            base_context = self.get_base_context()
+        else:
+            base_context = batch.base_context
+
+        providers = get_registry().providers.get(self.template_type)
+        if providers:
+            engine = self.engine
+            names = itertools.chain.from_iterable(
+                engine.get_variable_names(
+                    compiled_templates.get(self.pk, getattr(self, field), engine)
+                )
+                for field in fields
+            )
+            provided = resolve_providers(
+                providers, names, base_context.new_child(context), batch=batch
+            )
+            # below the context, explicitly passed values always win
+            base_context = base_context.new_child(provided)
+
+        # layered instead of copied, values set by the templates end up in empty top layers
+        return base_context.new_child(context).new_child({"domain": get_site_domain()})
+
+    def _render_subject(self, layers, subj_context=None):
+        engine = self.engine
+        tpl_subject = compiled_templates.get(self.pk, self.subject, engine)
+        if subj_context:
+            layers = layers.new_child(subj_context)
+
+        started = signals.start()
+        subject = engine.render(tpl_subject, layers)
+        signals.finish(started, "render_subject", template=self)
+        return subject
+
+    def _render_partial_body(self, layers):
+        """
+        Render the body without the base template.
+        """
+        engine = self.engine
+        tpl_body = compiled_templates.get(self.pk, self.body, engine)
 
-        ctx = Context(base_context)
-        ctx.update(context)
-        ctx.update({"domain": domain})
-        subj_ctx = Context(base_context)
-        subj_ctx.update(subj_context)
+        started = signals.start()
+        partial_body = engine.render(tpl_body, layers)
+        signals.finish(started, "render", template=self, html=partial_body)
+        return partial_body
 
-        partial_body = tpl_body.render(ctx)
+    def _render_base_template(self, partial_body, base_context):
         template_function = import_string(settings.BASE_TEMPLATE_LOADER)
 
-        body_context = copy.deepcopy(base_context)
-        body_context.update({"content": partial_body})
+        started = signals.start()
+        # template loaders expect a dict, a shallow one will do
+        body_context = {**base_context, "content": partial_body}
         body = template_function(self.base_template_path, body_context)
-
-        return tpl_subject.render(subj_ctx), mark_safe(body)
+        signals.finish(started, "render_base_template", template=self, html=body)
+        return body
 
     def build_message(
         self,
@@ -172,6 +354,7 @@ class MailTemplate(models.Model):
         attachments=None,
         cc_addresses=None,
         bcc_addresses=None,
+        batch=None,
     ):
         """
         You can pass the context only. We will pass the context to the subject context when we don't
@@ -179,13 +362,72 @@ class MailTemplate(models.Model):
 
         @param attachments: List of tuples, where the tuple can be one of two forms:
                             `(<absolute file path>, [mime type])` or
-                            `(<filename>, <content>, [mime type])`
+                            `(<filename>, <content>, [mime type])`,
+                            or `LazyAttachment` instances to read the file when it's sent
+        @param batch: optional `Batch` to share state with other messages of this template
         """
-        subject, body = self.render(context, subj_context)
+        subject, result = self.render_processed(context, subj_context, batch=batch)
+        return self._create_message(
+            subject,
+            result,
+            to_addresses,
+            txt=txt,
+            attachments=attachments,
+            cc_addresses=cc_addresses,
+            bcc_addresses=bcc_addresses,
+        )
 
-        result = process_html(body, settings.BASE_HOST)
+    def render_processed(self, context, subj_context=None, batch=None):
+        """
+        Render the message and process its HTML for sending.
+
+        Returns the subject and the `ProcessedHTML` of the body.
+        """
+        layers = self._get_render_context(context, batch)
+        subject = self._render_subject(layers, subj_context)
+        partial_body = self._render_partial_body(layers)
+        image_cache = batch.image_cache if batch else None
+
+        token = signals.bind_template(self)
+        try:
+            skeleton = None
+            if settings.TWO_PHASE_RENDERING:
+                skeleton = get_skeleton(
+                    self.base_template_path,
+                    settings.BASE_HOST,
+                    image_cache=image_cache,
+                )
+
+            if skeleton:
+                result = render_with_skeleton(
+                    skeleton, partial_body, settings.BASE_HOST, image_cache=image_cache
+                )
+            else:
+                body = self._render_base_template(partial_body, layers)
+                result = process_html(body, settings.BASE_HOST, image_cache=image_cache)
+        finally:
+            signals.unbind_template(token)
+
+        return subject, result
+
+    def _create_message(
+        self,
+        subject,
+        result,
+        to_addresses,
+        txt=False,
+        attachments=None,
+        cc_addresses=None,
+        bcc_addresses=None,
+    ):
+        text_body = txt or result.text
+        if text_body is None:
+            # eg: processed without `extract_text`
+            started = signals.start()
+            text_body = strip_tags(result.html)
+            signals.finish(started, "strip_tags", template=self, html=text_body)
 
-        text_body = txt or strip_tags(result.html)
+        started = signals.start()
 
         email_message = EmailMultiAlternatives(
             subject=subject,
@@ -200,6 +442,10 @@ class MailTemplate(models.Model):
 
         if attachments:
             for attachment in attachments:
+                if isinstance(attachment, MIMEBase):
+                    # eg: `LazyAttachment`
+                    email_message.attach(attachment)
+                    continue
                 if not attachment or not isinstance(attachment, tuple):
                     raise ValueError(
                         "Attachments should be passed as a list of tuples."
@@ -217,6 +463,13 @@ class MailTemplate(models.Model):
                 mime_image.add_header("Content-ID", f"<{att.cid}>")
                 email_message.attach(mime_image)
 
+        signals.finish(
+            started,
+            "mime",
+            template=self,
+            html=result.html,
+            attachments=email_message.attachments,
+        )
         return email_message
 
     def send_email(
@@ -235,7 +488,8 @@ class MailTemplate(models.Model):
 
         @param attachments: List of tuples, where the tuple can be one of two forms:
                             `(<absolute file path>, [mime type])` or
-                            `(<filename>, <content>, [mime type])`
+                            `(<filename>, <content>, [mime type])`,
+                            or `LazyAttachment` instances to read the file when it's sent
         """
         email_message = self.build_message(
             to_addresses,
@@ -246,7 +500,192 @@ class MailTemplate(models.Model):
             cc_addresses=cc_addresses,
             bcc_addresses=bcc_addresses,
         )
-        return email_message.send()
+        started = signals.start()
+        sent = email_message.send()
+        signals.finish(
+            started, "send", template=self, attachments=email_message.attachments
+        )
+        return sent
+
+    def send_mass(
+        self,
+        items,
+        chunk_size=None,
+        connection=None,
+        fail_silently=False,
+        processes=None,
+    ):
+        """
+        Send a message per item over a single connection.
+
+        The base context, compiled templates and loaded images are shared by all messages.
+
+        @param items: Iterable of `(to_addresses, context, subj_context, attachments)` tuples
+        @param chunk_size: Number of messages to build before sending them,
+                           defaults to `MAIL_EDITOR_SEND_MASS_CHUNK_SIZE`
+        @param processes: Build the messages in this many worker processes (see `build_many()`)
+        @param connection: Connection to send the messages over, it's left open (or closed) as it is
+        @param fail_silently: Don't log the messages that can't be sent. Unlike Django's
+                              `fail_silently`, errors are never raised: a message that
+                              can't be sent counts as 0 and doesn't stop the batch
+        @return: List with the number of sent messages (0 or 1) for each item. A lost
+                 connection is reopened, if that fails the batch stops and the list only
+                 covers the items sent before
+        """
+        chunk_size = chunk_size or settings.SEND_MASS_CHUNK_SIZE
+        if processes:
+            messages = self.build_many(
+                items, processes=processes, chunk_size=chunk_size
+            )
+        else:
+            messages = self._iter_messages(items, chunk_size)
+
+        if connection is None:
+            # not `fail_silently`, the SMTP backend would hide a lost connection
+            connection = get_connection()
+
+        # only close the connection if it's opened here
+        opened = connection.open()
+        try:
+            return self._send_messages(messages, connection, fail_silently)
+        finally:
+            if opened:
+                connection.close()
+
+    def _send_messages(self, messages, connection, fail_silently):
+        results = []
+        for message in messages:
+            started = signals.start()
+            try:
+                sent = send_message(connection, message, fail_silently)
+            except Exception:
+                logger.exception(
+                    "Connection lost after %d message(s), the rest isn't sent",
+                    len(results),
+                )
+                break
+            results.append(sent)
+            signals.finish(
+                started, "send", template=self, attachments=message.attachments
+            )
+        return results
+
+    def render_many(self, items, processes=None, chunk_size=50):
+        """
+        Render and process messages in a pool of worker processes.
+
+        @param items: Iterable of `(context, subj_context)` tuples, the contexts must be picklable
+        @param processes: Number of worker processes, defaults to the number of CPUs
+        @return: Iterator of `(subject, ProcessedHTML)` tuples, in the order of `items`
+        """
+        return render_many(self, items, processes=processes, chunk_size=chunk_size)
+
+    def build_many(self, items, processes=None, chunk_size=50):
+        """
+        Build messages in a pool of worker processes.
+
+        @param items: Iterable of `(to_addresses, context, subj_context, attachments)` tuples
+        @param processes: Number of worker processes, defaults to the number of CPUs
+        @return: Iterator of messages, in the order of `items`
+        """
+        items, render_items = itertools.tee(items)
+        results = render_many(
+            self,
+            (
+                (context, subj_context)
+                for _to, context, subj_context, _att in render_items
+            ),
+            processes=processes,
+            chunk_size=chunk_size,
+        )
+        for (to_addresses, _ctx, _subj_ctx, attachments), (subject, result) in zip(
+            items, results
+        ):
+            yield self._create_message(
+                subject, result, to_addresses, attachments=attachments
+            )
+
+    async def abuild_message(self, *args, **kwargs):
+        """
+        Async version of `build_message()`, rendering and processing run in a worker thread.
+        """
+        return await sync_to_async(self.build_message)(*args, **kwargs)
+
+    async def asend_email(
+        self,
+        to_addresses,
+        context,
+        subj_context=None,
+        txt=False,
+        attachments=None,
+        cc_addresses=None,
+        bcc_addresses=None,
+        backend=None,
+    ):
+        """
+        Async version of `send_email()`, delivering through the `MAIL_EDITOR_ASYNC_BACKEND`.
+        """
+        email_message = await self.abuild_message(
+            to_addresses,
+            context,
+            subj_context=subj_context,
+            txt=txt,
+            attachments=attachments,
+            cc_addresses=cc_addresses,
+            bcc_addresses=bcc_addresses,
+        )
+        if backend is None:
+            backend = get_async_backend()
+        results = await backend.send_messages([email_message])
+        return results[0]
+
+    async def asend_mass(self, items, chunk_size=None, backend=None):
+        """
+        Async version of `send_mass()`, each chunk is sent concurrently through the
+        `MAIL_EDITOR_ASYNC_BACKEND`.
+
+        @param items: Iterable of `(to_addresses, context, subj_context, attachments)` tuples
+        @return: List with the number of sent messages (0 or 1) for each item, a message that
+                 can't be sent is logged and doesn't stop the batch
+        """
+        if backend is None:
+            backend = get_async_backend()
+
+        batch = await sync_to_async(Batch)(self)
+        results = []
+        for chunk in chunked(items, chunk_size or settings.SEND_MASS_CHUNK_SIZE):
+            messages = await sync_to_async(self._build_messages)(chunk, batch)
+            results += await backend.send_messages(messages)
+        return results
+
+    def _build_messages(self, items, batch):
+        return [
+            self.build_message(
+                to_addresses,
+                context,
+                subj_context=subj_context,
+                attachments=attachments,
+                batch=batch,
+            )
+            for to_addresses, context, subj_context, attachments in items
+        ]
+
+    def _iter_messages(self, items, chunk_size):
+        batch = Batch(self)
+        for chunk in chunked(items, chunk_size):
+            yield from self._build_messages(chunk, batch)
 
     def get_variable_help_text(self):
         return variable_help_text(self.template_type)
+
+
+@receiver(post_save, sender=MailTemplate)
+def _invalidate_caches_on_save(sender, instance, **kwargs):
+    compiled_templates.invalidate(instance.pk, keep=(instance.subject, instance.body))
+    invalidate_resolution_cache()
+
+
+@receiver(post_delete, sender=MailTemplate)
+def _invalidate_caches_on_delete(sender, instance, **kwargs):
+    compiled_templates.invalidate(instance.pk)
+    invalidate_resolution_cache()
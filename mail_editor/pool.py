@@ -0,0 +1,121 @@
+"""
+Render messages in a pool of worker processes.
+
+Rendering and `process_html` are CPU bound, so large batches are spread over
+worker processes. Each worker sets up Django once and keeps its compiled
+template, stylesheet and image caches warm between chunks. The template is sent
+along with each chunk, but workers do use the database: the base context
+(including `MAIL_EDITOR_DYNAMIC_CONTEXT`), the context providers and the site
+domain are resolved in the worker, over its own database connection.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .batch import Batch, chunked
+
+# (processes, start method) -> [pool, number of batches using it]
+_pools = {}
+_lock = threading.Lock()
+
+
+def acquire_pool(processes=None, mp_context="spawn") -> ProcessPoolExecutor:
+    """
+    Return the shared worker pool for this number of processes and start method.
+
+    Call `release_pool()` with the same arguments when done with it.
+    """
+    key = (processes or os.cpu_count(), mp_context)
+    with _lock:
+        entry = _pools.get(key)
+        if entry is None:
+            pool = ProcessPoolExecutor(
+                max_workers=key[0],
+                mp_context=multiprocessing.get_context(mp_context),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE"),),
+            )
+            entry = _pools[key] = [pool, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_pool(processes=None, mp_context="spawn"):
+    """
+    Release a pool returned by `acquire_pool()`.
+
+    The pool stays up for the next batch, the other pools that aren't used anymore are
+    shut down. So a pool is never shut down while rendering, and at most one is idle.
+    """
+    key = (processes or os.cpu_count(), mp_context)
+    with _lock:
+        _pools[key][1] -= 1
+        idle = [
+            other
+            for other, (_pool, users) in _pools.items()
+            if other != key and not users
+        ]
+        pools = [_pools.pop(other)[0] for other in idle]
+    for pool in pools:
+        pool.shutdown(wait=False)
+
+
+def shutdown_pool():
+    """
+    Shut down all pools, batches that are still rendering will fail.
+    """
+    with _lock:
+        pools = [pool for pool, _users in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def render_many(
+    mail_template, items, processes=None, chunk_size=50, mp_context="spawn"
+):
+    """
+    Render and process messages in worker processes.
+
+    @param items: Iterable of `(context, subj_context)` tuples, the contexts must be picklable
+    @return: Iterator of `(subject, ProcessedHTML)` tuples, in the order of `items`
+    """
+    processes = processes or os.cpu_count()
+    pool = acquire_pool(processes, mp_context)
+    try:
+        # bound the number of chunks in flight so long batches aren't all pickled at once
+        max_pending = processes * 2
+        pending = deque()
+
+        for chunk in chunked(items, chunk_size):
+            pending.append(pool.submit(_render_chunk, mail_template, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        release_pool(processes, mp_context)
+
+
+def _init_worker(settings_module):
+    if settings_module:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    from django.apps import apps
+
+    if not apps.ready:
+        import django
+
+        django.setup()
+
+
+def _render_chunk(mail_template, items):
+    batch = Batch(mail_template)
+    return [
+        mail_template.render_processed(context, subj_context, batch=batch)
+        for context, subj_context in items
+    ]
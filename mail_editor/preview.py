@@ -0,0 +1,104 @@
+"""
+Cached renders of the admin previews.
+
+A preview is keyed by the content and engine of the template, its preview contexts,
+the language and the site, and is rebuilt when the base template or one of its
+stylesheets changes. The key and the file mtimes also make up the ETag, so
+unchanged previews can be answered with a 304. There's no `Last-Modified`: the
+preview of a reverted template is older than the one the client has.
+"""
+
+from typing import NamedTuple, Optional
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import get_language
+
+from .cache import LRUCache, content_hash
+from .process import extract_stylesheets, process_html
+from .settings import settings
+from .skeleton import _find_template_file, _get_mtime
+from .utils import get_site_domain
+
+
+class Preview(NamedTuple):
+    subject: str
+    html: str
+    etag: str
+    # (file path, mtime) of the base template and its stylesheets
+    dependencies: tuple[tuple[str, Optional[float]], ...]
+
+    def is_stale(self) -> bool:
+        return any(_get_mtime(path) != mtime for path, mtime in self.dependencies)
+
+
+_previews = LRUCache(max_entries=64)
+
+
+def get_preview(template) -> Preview:
+    """
+    Return the rendered and processed preview of the template.
+    """
+    base_context = template.get_base_context()
+    subject_ctx, body_ctx = template.get_preview_contexts(base_context)
+    key = _get_key(template, base_context, subject_ctx, body_ctx)
+
+    preview = _previews.get(key)
+    if preview is None or preview.is_stale():
+        preview = build_preview(template, key, subject_ctx, body_ctx)
+        _previews.set(key, preview)
+    return preview
+
+
+def build_preview(template, key, subject_ctx, body_ctx) -> Preview:
+    subject, body = template.render(body_ctx, subject_ctx)
+    result = process_html(
+        body, settings.BASE_HOST, extract_attachments=False, extract_text=False
+    )
+
+    _css, stylesheets = extract_stylesheets(body, settings.BASE_HOST)
+    template_file = _find_template_file(template.base_template_path)
+    dependencies = tuple(
+        (path, _get_mtime(path)) for path in filter(None, [template_file, *stylesheets])
+    )
+
+    return Preview(
+        subject,
+        result.html,
+        content_hash(f"{key}\0{dependencies!r}"),
+        dependencies,
+    )
+
+
+def clear_previews():
+    _previews.clear()
+
+
+def _get_key(template, base_context, subject_ctx, body_ctx) -> str:
+    parts = [
+        template.pk,
+        template.template_type,
+        template.language,
+        template.subject,
+        template.body,
+        template.base_template_path,
+        template.engine.name,
+        get_language(),
+        get_site_domain(),
+        settings.BASE_HOST,
+    ]
+    # the base context can be used by the templates without being configured
+    for context in (base_context, subject_ctx, body_ctx):
+        parts.append(sorted((k, str(v)) for k, v in context.items()))
+    return content_hash(repr(parts))
+
+
+@receiver(setting_changed)
+def _clear_previews(setting, **kwargs):
+    if setting.startswith("MAIL_EDITOR_") or setting in (
+        "TEMPLATES",
+        "STATIC_URL",
+        "STATIC_ROOT",
+        "STATICFILES_DIRS",
+    ):
+        clear_previews()
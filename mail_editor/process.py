@@ -1,9 +1,11 @@
+import binascii
 import hashlib
 import os
+import threading
+from html import escape
 from mimetypes import guess_type
 from typing import NamedTuple, Optional
-from urllib.parse import urlparse
-from urllib.request import urlopen
+from urllib.parse import unquote_to_bytes, urlparse
 
 from django.conf import settings
 from django.contrib.staticfiles import finders
@@ -11,6 +13,12 @@ from django.contrib.staticfiles import finders
 import css_inline
 from lxml import etree
 
+from . import signals
+from .cache import LRUCache
+from .images import optimize_image
+from .settings import settings as mail_editor_settings
+from .text import html_to_text
+
 """
 notes: for attaching and inlining STATIC and MEDIA is hardcoded to FileSystemStorage
 """
@@ -28,6 +36,8 @@ supported_types = [
 class FileData(NamedTuple):
     content: bytes
     content_type: str
+    # precomputed content ID, if known
+    cid: Optional[str] = None
 
 
 class CIDAttachment(NamedTuple):
@@ -39,6 +49,8 @@ class CIDAttachment(NamedTuple):
 class ProcessedHTML(NamedTuple):
     html: str
     cid_attachments: list[CIDAttachment]
+    # plain text alternative, `None` if not extracted
+    text: Optional[str] = None
 
 
 def process_html(
@@ -46,79 +58,261 @@ def process_html(
     base_url: str,
     extract_attachments: bool = True,
     inline_css: bool = True,
+    image_cache: Optional[dict] = None,
+    extract_text: bool = True,
 ) -> ProcessedHTML:
+    """
+    image_cache: optional dict of url -> `CIDAttachment` (or `None` for bad urls),
+                 pass the same dict to share loaded images between messages
+    extract_text: render the plain text alternative from the parsed tree
+    """
     # TODO handle errors in cosmetics and make sure we always produce something
-    parser = etree.HTMLParser()
-    root = etree.fromstring(html, parser)
+    started = signals.start()
+    root = etree.fromstring(html, _get_parser())
+    signals.finish(started, "process_html.parse", html=html)
+
+    image_attachments = _process_tree(
+        root, base_url, extract_attachments, inline_css, image_cache
+    )
+    text = _extract_text(root) if extract_text else None
+
+    started = signals.start()
+    result = etree.tostring(root, encoding="unicode", method="html")
+    signals.finish(started, "process_html.serialize", html=result)
+
+    if inline_css:
+        started = signals.start()
+        result = _html_inline_css(result)
+        signals.finish(started, "process_html.inline_css", html=result)
+
+    # TODO support inlining CSS referenced images?
+
+    return ProcessedHTML(result, list(image_attachments.values()), text)
+
+
+def process_fragment(
+    html: str,
+    base_url: str,
+    css: str = "",
+    extract_attachments: bool = True,
+    inline_css: bool = True,
+    image_cache: Optional[dict] = None,
+    extract_text: bool = True,
+) -> ProcessedHTML:
+    """
+    Process partial HTML that will be placed inside an already processed document.
+
+    css: stylesheet to inline in the fragment, eg: collected from the base template
+    """
+    started = signals.start()
+    root = etree.fromstring(f"<html><body>{html}</body></html>", _get_parser())
+    signals.finish(started, "process_html.parse", html=html)
+
+    image_attachments = _process_tree(
+        root, base_url, extract_attachments, inline_css, image_cache
+    )
+    text = _extract_text(root) if extract_text else None
+
+    if inline_css:
+        # fragments have no head, so move their own stylesheets to the inlined css
+        css_parts = [css]
+        for elem in list(root.iter("style")):
+            css_parts.append(elem.text or "")
+            _remove_element(elem)
+        css = "\n".join(filter(None, css_parts))
+
+    started = signals.start()
+    body = root.find("body")
+    result = escape(body.text or "", quote=False) + "".join(
+        etree.tostring(elem, encoding="unicode", method="html") for elem in body
+    )
+    signals.finish(started, "process_html.serialize", html=result)
+
+    if inline_css and css:
+        started = signals.start()
+        result = _fragment_inline_css(result, css)
+        signals.finish(started, "process_html.inline_css", html=result)
+
+    return ProcessedHTML(result, list(image_attachments.values()), text)
+
 
+def process_text(html: str, base_url: str, placeholder: Optional[str] = None) -> str:
+    """
+    Render the plain text alternative of a document on its own.
+
+    placeholder: see `html_to_text()`
+    """
+    root = etree.fromstring(html, _get_parser())
+    for elem in root.iter("a"):
+        url = elem.get("href")
+        if url:
+            elem.set("href", make_url_absolute(url, base_url))
+    return html_to_text(root, placeholder)
+
+
+def extract_stylesheets(html: str, base_url: str) -> tuple[str, list[str]]:
+    """
+    Collect the CSS of the <style> and local <link> elements of a document.
+
+    returns the CSS and the file paths of the linked stylesheets
+    """
+    root = etree.fromstring(html, _get_parser())
+    static_url = make_url_absolute(settings.STATIC_URL, base_url)
+
+    css_parts = []
+    paths = []
+    for elem in root.iter("style", "link"):
+        if elem.tag == "style":
+            css_parts.append(elem.text or "")
+            continue
+        url = elem.get("href")
+        if not url or not _is_stylesheet_link(elem):
+            continue
+        partial_file_path = _find_static_path_for_inliner(
+            make_url_absolute(url, base_url), static_url
+        )
+        if partial_file_path:
+            path = os.path.join(FILE_ROOT, partial_file_path)
+            paths.append(path)
+            css_parts.append(_read_stylesheet(path))
+
+    return "\n".join(filter(None, css_parts)), paths
+
+
+def _process_tree(
+    root,
+    base_url: str,
+    extract_attachments: bool,
+    inline_css: bool,
+    image_cache: Optional[dict],
+) -> dict[str, CIDAttachment]:
     static_url = make_url_absolute(settings.STATIC_URL, base_url)
     media_url = make_url_absolute(settings.MEDIA_URL, base_url)
 
     image_attachments = dict()
-    url_cid_cache = dict()
-
-    absolute_attribs = [
-        (".//a", "href"),
-        (".//img", "src"),
-        (".//link", "href"),
-    ]
-
-    for selector, attr in absolute_attribs:
-        for elem in root.iterfind(selector):
-            url = elem.get(attr)
-            if not url:
-                continue
+    if image_cache is None:
+        image_cache = dict()
+
+    # single pass over the tree, the elements needed by the next stages are collected
+    started = signals.start()
+    images = []
+    links = []
+    for elem in root.iter(*_URL_ATTRIBUTES):
+        tag = elem.tag
+        if tag == "img":
+            images.append(elem)
+        elif tag == "link":
+            links.append(elem)
+        attr = _URL_ATTRIBUTES[tag]
+        url = elem.get(attr)
+        if url:
             elem.set(attr, make_url_absolute(url, base_url))
+    signals.finish(started, "process_html.absolutize")
 
     if extract_attachments:
+        started = signals.start()
+        optimize_images = mail_editor_settings.OPTIMIZE_IMAGES
         # extract and swap related content ID's
-        for elem in root.iterfind(".//img"):
+        for elem in images:
             url = elem.get("src")
             if not url:
                 continue
+            cache_key = url
+            if optimize_images:
+                # optimized for the declared dimensions
+                cache_key = (url, elem.get("width"), elem.get("height"))
             # cache cid & content for deduplication (eg: icons)
-            if url in url_cid_cache:
-                cid = url_cid_cache[url]
-                if cid is None:
-                    # we remembered this was a bad url
-                    continue
+            if cache_key in image_cache:
+                attachment = image_cache[cache_key]
             else:
                 data = load_image(url, base_url, static_url, media_url)
-                if not data:
-                    # if we can't load the image leave element as-is and remember bad url
-                    url_cid_cache[url] = None
-                    continue
-                cid = cid_for_bytes(data.content)
-                url_cid_cache[url] = cid
-                image_attachments[cid] = CIDAttachment(
-                    cid, data.content, data.content_type
-                )
+                if data and optimize_images:
+                    data = optimize_image(data, elem.get("width"), elem.get("height"))
+                if data:
+                    attachment = CIDAttachment(
+                        data.cid or cid_for_bytes(data.content),
+                        data.content,
+                        data.content_type,
+                    )
+                else:
+                    # remember this was a bad url
+                    attachment = None
+                image_cache[cache_key] = attachment
+
+            if attachment is None:
+                # if we can't load the image leave element as-is
+                continue
 
-            elem.set("src", f"cid:{cid}")
+            image_attachments[attachment.cid] = attachment
+            elem.set("src", f"cid:{attachment.cid}")
+        signals.finish(
+            started, "process_html.images", attachments=image_attachments.values()
+        )
 
     if inline_css:
-        for elem in root.iterfind(".//link"):
+        started = signals.start()
+        for elem in links:
             url = elem.get("href")
-            if not url:
+            if not url or not _is_stylesheet_link(elem):
                 continue
-            # resolving back to paths is needed so css-inliner can use a file:// base_url
             partial_file_path = _find_static_path_for_inliner(url, static_url)
             if partial_file_path:
-                elem.set("href", partial_file_path)
+                # swap in the (cached) stylesheet so the inliner doesn't read it from disk
+                style = etree.Element("style")
+                style.text = _read_stylesheet(
+                    os.path.join(FILE_ROOT, partial_file_path)
+                )
+                style.tail = elem.tail
+                elem.getparent().replace(elem, style)
             else:
                 # remove this element because we don't want to load external stylesheets
                 elem.getparent().remove(elem)
+        signals.finish(started, "process_html.stylesheets")
 
-    result = etree.tostring(
-        root, encoding="utf8", pretty_print=False, method="html"
-    ).decode("utf8")
+    return image_attachments
 
-    if inline_css:
-        result = _html_inline_css(result)
 
-    # TODO support inlining CSS referenced images?
+def _extract_text(root) -> str:
+    # after making the links absolute, but before the stylesheets are inlined
+    started = signals.start()
+    text = html_to_text(root)
+    signals.finish(started, "process_html.text", html=text)
+    return text
+
 
-    return ProcessedHTML(result, list(image_attachments.values()))
+# element -> attribute with a URL to make absolute
+_URL_ATTRIBUTES = {
+    "a": "href",
+    "img": "src",
+    "link": "href",
+}
+
+_local = threading.local()
+
+
+def _get_parser() -> etree.HTMLParser:
+    # parsers can be reused but not shared between threads
+    try:
+        return _local.parser
+    except AttributeError:
+        _local.parser = etree.HTMLParser()
+        return _local.parser
+
+
+def _is_stylesheet_link(elem) -> bool:
+    return "stylesheet" in (elem.get("rel") or "").lower().split()
+
+
+def _remove_element(elem):
+    # keep the text following the element
+    parent = elem.getparent()
+    if elem.tail:
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + elem.tail
+        else:
+            parent.text = (parent.text or "") + elem.tail
+    parent.remove(elem)
 
 
 def cid_for_bytes(content: bytes) -> str:
@@ -172,30 +366,92 @@ def load_image(
 
 
 def read_data_uri(uri: str) -> Optional[FileData]:
+    """
+    Decode a `data:` URI, cached by its hash within the `MAIL_EDITOR_IMAGE_CACHE_SIZE` budget.
+
+    Returns `None` for invalid URIs and content over `MAIL_EDITOR_DATA_URI_MAX_SIZE` bytes.
+    """
     assert uri.startswith("data:")
 
     try:
-        with urlopen(uri) as response:
-            content = response.read()
-            content_type = response.headers.get("Content-Type")
-            if content and content_type:
-                return FileData(content, content_type)
-    except Exception:
-        # TODO stricter exception types
+        raw = uri.encode("ascii")
+    except UnicodeEncodeError:
+        return None
+
+    key = ("data", hashlib.sha1(raw, usedforsecurity=False).digest())
+    data = _images.get(key)
+    if data is not None:
+        return data
+
+    data = _decode_data_uri(raw)
+    if data is not None:
+        _images.max_bytes = mail_editor_settings.IMAGE_CACHE_SIZE
+        _images.set(key, data)
+    return data
+
+
+def _decode_data_uri(raw: bytes) -> Optional[FileData]:
+    # data:[<media type>][;<parameter>...][;base64],<data>
+    comma = raw.find(b",")
+    if comma == -1:
+        return None
+    params = raw[5:comma].decode("ascii").split(";")
+    content_type = params[0].strip().lower() or "text/plain"
+    is_base64 = params[-1].strip().lower() == "base64"
+
+    max_size = mail_editor_settings.DATA_URI_MAX_SIZE
+    # decode straight from the source, without copying the data part
+    view = memoryview(raw)[comma + 1 :]
+    try:
+        if raw.find(b"%", comma) != -1:
+            # percent-encoded, rare for (base64) images
+            view = unquote_to_bytes(view.tobytes())
+        if is_base64:
+            # checked before decoding, allowing for padding
+            if (len(view) - 2) // 4 * 3 > max_size:
+                return None
+            content = binascii.a2b_base64(view)
+        else:
+            content = bytes(view)
+    except (binascii.Error, ValueError):
         # we never want errors to block important mail
-        # maybe we should log though
-        pass
+        return None
+
+    if not content or len(content) > max_size:
+        return None
+    return FileData(content, content_type, cid_for_bytes(content))
 
-    return None
+
+def _sizeof_file_data(data: FileData) -> int:
+    return len(data.content)
+
+
+_images = LRUCache(sizeof=_sizeof_file_data)
 
 
 def read_image_file(path: str) -> Optional[FileData]:
+    """
+    Read an image, cached by path, inode, mtime and size within the
+    `MAIL_EDITOR_IMAGE_CACHE_SIZE` byte budget.
+    """
     try:
+        # stat() follows symlinks, so the key changes when the target does
+        stat = os.stat(path)
+        key = (path, stat.st_ino, stat.st_mtime, stat.st_size)
+
+        data = _images.get(key)
+        if data is not None:
+            return data
+
         with open(path, "rb") as f:
             content = f.read()
         # is guess_type() what we want or do we look in the content?
         content_type, _encoding = guess_type(path)
-        return FileData(content, content_type)
+        data = FileData(content, content_type, cid_for_bytes(content))
+
+        _images.max_bytes = mail_editor_settings.IMAGE_CACHE_SIZE
+        _images.set(key, data)
+        return data
     except Exception:
         # TODO stricter exception types
         # we never want errors to block important mail
@@ -203,10 +459,23 @@ def read_image_file(path: str) -> Optional[FileData]:
         return None
 
 
+def clear_image_cache():
+    _images.clear()
+
+
 def make_url_absolute(url: str, base_url: str = "") -> str:
     """
     base_url: https://domain
     """
+    # fast paths for the common cases, with the same results as below but without parsing
+    if url:
+        if url.startswith(("https://", "http://")):
+            return url
+        if url[0] in "/#" and "://" not in url:
+            if url[0] == "#":
+                url = f"/{url}"
+            return base_url.rstrip("/") + url
+
     # TODO we're using the path part as file path so we should handle sneaky attempts to use relative ".."
     try:
         parse = urlparse(url)
@@ -229,18 +498,28 @@ def make_url_absolute(url: str, base_url: str = "") -> str:
     return base_url + url
 
 
+_inliner = None
+
+
+def _get_inliner() -> css_inline.CSSInliner:
+    global _inliner
+
+    # the configuration is static so a single inliner is reused for all messages,
+    # linked stylesheets are already swapped for <style> elements
+    if _inliner is None:
+        _inliner = css_inline.CSSInliner(
+            inline_style_tags=True,
+            keep_style_tags=False,
+            keep_link_tags=False,
+            extra_css=None,
+            load_remote_stylesheets=False,
+        )
+    return _inliner
+
+
 def _html_inline_css(html: str) -> str:
-    inliner = css_inline.CSSInliner(
-        inline_style_tags=True,
-        keep_style_tags=False,
-        keep_link_tags=False,
-        extra_css=None,
-        load_remote_stylesheets=True,
-        # link urls will have been transformed earlier
-        base_url=f"file://{FILE_ROOT}/",
-    )
     try:
-        html = inliner.inline(html)
+        html = _get_inliner().inline(html)
         return html
     except css_inline.InlineError as e:
         # we never want errors to block important mail
@@ -251,6 +530,39 @@ def _html_inline_css(html: str) -> str:
             return html
 
 
+def _fragment_inline_css(html: str, css: str) -> str:
+    try:
+        return _get_inliner().inline_fragment(html, css)
+    except css_inline.InlineError as e:
+        # we never want errors to block important mail
+        if settings.DEBUG:
+            raise e
+        else:
+            return html
+
+
+_stylesheets = LRUCache(max_entries=128)
+
+
+def _read_stylesheet(path: str) -> str:
+    """
+    Read a stylesheet, cached by path until the file's mtime or size changes.
+    """
+    try:
+        stat = os.stat(path)
+        cached = _stylesheets.get(path)
+        if cached and cached[0] == (stat.st_mtime, stat.st_size):
+            return cached[1]
+
+        with open(path, "r", encoding="utf8") as f:
+            css = f.read()
+        _stylesheets.set(path, ((stat.st_mtime, stat.st_size), css))
+        return css
+    except (OSError, UnicodeDecodeError):
+        # we never want errors to block important mail
+        return ""
+
+
 def _find_static_path_for_inliner(url: str, static_url: str) -> Optional[str]:
     if url.startswith(static_url):
         file_name = url[len(static_url) :]
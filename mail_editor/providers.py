@@ -0,0 +1,100 @@
+"""
+Context variables computed on demand.
+
+A variable in `MAIL_EDITOR_CONF` can declare a `provider`: a callable (or the import
+path to one) that receives the context and returns the value of the variable. It's
+only called when the subject or body of the template uses the variable and the
+context doesn't contain it already, at most once per render.
+
+With a `provider_ttl` (in seconds) the value is shared by all messages of a batch
+(eg: `send_mass()`) for that long, so it must not depend on the context of a
+single message.
+"""
+
+import time
+import weakref
+from typing import Callable, NamedTuple, Optional
+
+from django.template.base import FilterExpression, Node, Variable
+from django.template.smartif import TokenBase
+
+
+class Provider(NamedTuple):
+    func: Callable
+    ttl: Optional[float] = None
+
+
+def resolve_providers(providers, names, context, batch=None) -> dict:
+    """
+    Return the values of the providers of the variables used by the templates.
+
+    names: the names of the variables used, see `BaseEngine.get_variable_names()`
+    context: the context the templates will be rendered with, without the provided values
+    """
+    values = {}
+    for name in names:
+        if name in values or name in context:
+            continue
+        provider = providers.get(name)
+        if provider is None:
+            continue
+        if provider.ttl and batch is not None:
+            values[name] = _get_batch_value(batch, name, provider, context)
+        else:
+            values[name] = provider.func(context)
+    return values
+
+
+def _get_batch_value(batch, name, provider, context):
+    now = time.monotonic()
+    cached = batch.provided.get(name)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    value = provider.func(context)
+    batch.provided[name] = (now + provider.ttl, value)
+    return value
+
+
+_variable_names = weakref.WeakKeyDictionary()
+
+
+def get_variable_names(template) -> frozenset:
+    """
+    Return the names of the context variables used by a compiled Django template.
+
+    Like the validator this looks at `{{ variables }}`, but also at the arguments of
+    filters and (built-in) tags like `{% if %}`, `{% for %}` and `{% with %}`.
+    """
+    names = _variable_names.get(template)
+    if names is None:
+        names = set()
+        for node in template.nodelist.get_nodes_by_type(Node):
+            for expression in _find_expressions(vars(node).values()):
+                _add_names(names, expression)
+        names = frozenset(names)
+        _variable_names[template] = names
+    return names
+
+
+def _find_expressions(values):
+    for value in values:
+        if isinstance(value, FilterExpression):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            yield from _find_expressions(value)
+        elif isinstance(value, dict):
+            yield from _find_expressions(value.values())
+        elif isinstance(value, TokenBase):
+            # the condition of an {% if %}
+            yield from _find_expressions(
+                [getattr(value, attr, None) for attr in ("value", "first", "second")]
+            )
+
+
+def _add_names(names, expression):
+    variables = [expression.var]
+    for _func, args in expression.filters:
+        variables.extend(arg for _lookup, arg in args)
+    for var in variables:
+        if isinstance(var, Variable) and var.lookups:
+            names.add(var.lookups[0])
@@ -0,0 +1,117 @@
+"""
+Process-wide registry of the configured template types.
+
+`MAIL_EDITOR_CONF` is parsed once and the result is shared by every `MailTemplate`
+instance, form and admin page. The registry is rebuilt when the setting changes.
+"""
+
+import threading
+from types import MappingProxyType
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .mail_template import Variable
+from .providers import Provider
+from .settings import settings
+
+
+class TemplateRegistry(object):
+    def __init__(self, templates):
+        config = {}
+        providers = {}
+        engines = {}
+        choices = []
+        names = {}
+        descriptions = {}
+        for key, values in templates.items():
+            config[key] = {
+                "subject": tuple(Variable(**var) for var in values.get("subject", [])),
+                "body": tuple(Variable(**var) for var in values.get("body", [])),
+            }
+            template_providers = {
+                var.name: Provider(
+                    (
+                        import_string(var.provider)
+                        if isinstance(var.provider, str)
+                        else var.provider
+                    ),
+                    var.provider_ttl,
+                )
+                for var in config[key]["subject"] + config[key]["body"]
+                if var.provider
+            }
+            if template_providers:
+                providers[key] = MappingProxyType(template_providers)
+            if values.get("engine"):
+                engines[key] = values["engine"]
+            names[key] = values.get("name", key.title())
+            descriptions[key] = values.get("description")
+            choices.append((key, names[key]))
+
+        self.config = MappingProxyType(config)
+        # template type -> variable name -> `Provider`, only for types with providers
+        self.providers = MappingProxyType(providers)
+        # template type -> engine name, only for types that override `MAIL_EDITOR_ENGINE`
+        self.engines = MappingProxyType(engines)
+        self.choices = tuple(choices)
+        self.names = MappingProxyType(names)
+        self.descriptions = MappingProxyType(descriptions)
+        self._help_texts = {}
+
+    def get_help_text(self, template_type):
+        # descriptions may be lazy translations
+        key = (template_type, get_language())
+        try:
+            return self._help_texts[key]
+        except KeyError:
+            pass
+
+        subject_html = "<ul>"
+        body_html = "<label>Body variables:</label> <ul>"
+
+        template_conf = self.config.get(template_type)
+        if template_conf:
+            for variable in template_conf["subject"]:
+                subject_html += variable.get_html_list_item()
+            for variable in template_conf["body"]:
+                body_html += variable.get_html_list_item()
+
+        subject_html += "</ul>"
+        body_html += "</ul>"
+
+        help_text = mark_safe("{}<br><br>{}".format(subject_html, body_html))
+        self._help_texts[key] = help_text
+        return help_text
+
+
+_registry = None
+_lock = threading.Lock()
+
+
+def get_registry() -> TemplateRegistry:
+    global _registry
+
+    registry = _registry
+    if registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = TemplateRegistry(settings.TEMPLATES)
+            registry = _registry
+    return registry
+
+
+def reset_registry():
+    global _registry
+
+    with _lock:
+        _registry = None
+
+
+@receiver(setting_changed)
+def _reset_registry(setting, **kwargs):
+    if setting in ("MAIL_EDITOR_CONF", "MAIL_EDITOR_TEMPLATES"):
+        reset_registry()
@@ -3,8 +3,6 @@ import warnings
 from django.conf import settings as django_settings
 from django.utils.module_loading import import_string
 
-from .mail_template import Variable
-
 
 class Settings(object):
     """
@@ -57,27 +55,152 @@ class Settings(object):
     def UNIQUE_LANGUAGE_TEMPLATES(self):
         return getattr(django_settings, "MAIL_EDITOR_UNIQUE_LANGUAGE_TEMPLATES", True)
 
+    @property
+    def ENGINE(self):
+        """
+        engine for the subject and body, "django", "jinja2" or the import path to an engine class
+        """
+        return getattr(django_settings, "MAIL_EDITOR_ENGINE", "django")
+
+    @property
+    def JINJA2_ENVIRONMENT(self):
+        """
+        import path to a callable returning the (sandboxed) environment of the jinja2 engine
+        """
+        return getattr(
+            django_settings,
+            "MAIL_EDITOR_JINJA2_ENVIRONMENT",
+            "mail_editor.engines.jinja2_environment",
+        )
+
+    @property
+    def TEMPLATE_CACHE_SIZE(self):
+        """
+        maximum number of compiled subject/body templates kept in memory per process
+        """
+        return getattr(django_settings, "MAIL_EDITOR_TEMPLATE_CACHE_SIZE", 512)
+
+    @property
+    def RESOLUTION_CACHE(self):
+        """
+        cache for `MailTemplate.objects.get_for_language()` lookups, either `None` (disabled),
+        "local" (per process) or the alias of one of Django's CACHES to share it between workers
+        """
+        return getattr(django_settings, "MAIL_EDITOR_RESOLUTION_CACHE", None)
+
+    @property
+    def RESOLUTION_CACHE_TIMEOUT(self):
+        return getattr(django_settings, "MAIL_EDITOR_RESOLUTION_CACHE_TIMEOUT", 3600)
+
+    @property
+    def SEND_MASS_CHUNK_SIZE(self):
+        """
+        number of messages `MailTemplate.send_mass()` builds before sending them
+        """
+        return getattr(django_settings, "MAIL_EDITOR_SEND_MASS_CHUNK_SIZE", 100)
+
+    @property
+    def IMAGE_CACHE_SIZE(self):
+        """
+        maximum number of bytes of inline images kept in memory per process
+        """
+        return getattr(
+            django_settings, "MAIL_EDITOR_IMAGE_CACHE_SIZE", 32 * 1024 * 1024
+        )
+
+    @property
+    def OPTIMIZE_IMAGES(self):
+        """
+        downscale and recompress inline images (requires Pillow)
+        """
+        return getattr(django_settings, "MAIL_EDITOR_OPTIMIZE_IMAGES", False)
+
+    @property
+    def IMAGE_MAX_DIMENSION(self):
+        """
+        maximum width and height in pixels of optimized images without declared dimensions
+        """
+        return getattr(django_settings, "MAIL_EDITOR_IMAGE_MAX_DIMENSION", 1200)
+
+    @property
+    def IMAGE_QUALITY(self):
+        """
+        JPEG quality of optimized images
+        """
+        return getattr(django_settings, "MAIL_EDITOR_IMAGE_QUALITY", 85)
+
+    @property
+    def IMAGE_OPTIMIZATION_CACHE_DIR(self):
+        """
+        directory for optimized images, defaults to a directory in the system's temp dir
+        """
+        return getattr(
+            django_settings, "MAIL_EDITOR_IMAGE_OPTIMIZATION_CACHE_DIR", None
+        )
+
+    @property
+    def DATA_URI_MAX_SIZE(self):
+        """
+        maximum number of bytes of an inline `data:` image, larger images are left as-is
+        """
+        return getattr(
+            django_settings, "MAIL_EDITOR_DATA_URI_MAX_SIZE", 5 * 1024 * 1024
+        )
+
+    @property
+    def ATTACHMENT_CACHE_SIZE(self):
+        """
+        maximum number of bytes of encoded `LazyAttachment` files kept in memory per process
+        """
+        return getattr(
+            django_settings, "MAIL_EDITOR_ATTACHMENT_CACHE_SIZE", 64 * 1024 * 1024
+        )
+
+    @property
+    def ASYNC_BACKEND(self):
+        """
+        import path to the async backend used by `asend_email()` and `asend_mass()`
+        """
+        return getattr(
+            django_settings,
+            "MAIL_EDITOR_ASYNC_BACKEND",
+            "mail_editor.backends.ThreadedEmailBackend",
+        )
+
+    @property
+    def ASYNC_CONCURRENCY(self):
+        """
+        maximum number of messages the async backend sends concurrently
+        """
+        return getattr(django_settings, "MAIL_EDITOR_ASYNC_CONCURRENCY", 4)
+
+    @property
+    def WARMUP(self):
+        """
+        warm up the caches in a background thread when Django starts (not for management
+        commands, except `runserver`), see `mail_editor.warmup`
+        """
+        return getattr(django_settings, "MAIL_EDITOR_WARMUP", False)
+
+    @property
+    def TWO_PHASE_RENDERING(self):
+        """
+        render and process the base template once and only process the content per message,
+        the base template then only has access to the base context and domain
+        """
+        return getattr(django_settings, "MAIL_EDITOR_TWO_PHASE_RENDERING", False)
+
 
 settings = Settings()
 
 
 def get_choices() -> list[tuple[str, str]]:
-    choices = []
-    for key, values in settings.TEMPLATES.items():
-        choices += [(key, values.get("name", key.title()))]
-    return choices
+    from .registry import get_registry
+
+    return list(get_registry().choices)
 
 
 def get_config():
-    config = {}
-    for key, values in settings.TEMPLATES.items():
-        subject_variables = []
-        for var in values.get("subject", []):
-            subject_variables.append(Variable(**var))
-
-        body_variables = []
-        for var in values.get("body", []):
-            body_variables.append(Variable(**var))
-
-        config[key] = {"subject": subject_variables, "body": body_variables}
-    return config
+    from .registry import get_registry
+
+    return get_registry().config
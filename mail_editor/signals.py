@@ -0,0 +1,126 @@
+"""
+Instrumentation of the render and send pipeline.
+
+`phase_finished` is sent at the end of each phase with the keyword arguments:
+
+- `phase`: one of `PHASES`
+- `duration`: seconds, as measured with `time.perf_counter()`
+- `template_type` and `language` of the template, if known
+- `html_size`: size in bytes of the (resulting) HTML, if relevant for the phase
+- `attachments` and `attachment_bytes`: number and size of the attachments, if relevant
+
+The sender is the `MailTemplate` class, or `None` when `process_html()` is used on its own.
+When no receivers are connected the pipeline skips the timers altogether.
+"""
+
+import time
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+phase_finished = Signal()
+
+# sent with `content_type`, `original_size` and `optimized_size` when an image is optimized
+image_optimized = Signal()
+
+PHASES = (
+    "lookup",
+    "base_context",
+    "render_subject",
+    "render",
+    "render_base_template",
+    "process_html.parse",
+    "process_html.absolutize",
+    "process_html.images",
+    "process_html.stylesheets",
+    "process_html.text",
+    "process_html.serialize",
+    "process_html.inline_css",
+    # only when the `ProcessedHTML` has no text
+    "strip_tags",
+    "mime",
+    "send",
+)
+
+# the template being processed, for phases that don't have access to it
+_current_template = ContextVar("mail_editor_current_template", default=None)
+
+
+def start():
+    """
+    Return the start time of a phase, or `None` if nobody is listening.
+    """
+    if not phase_finished.receivers:
+        return None
+    return time.perf_counter()
+
+
+def finish(
+    started,
+    phase,
+    template=None,
+    html=None,
+    attachments=None,
+    template_type=None,
+    language=None,
+    sender=None,
+):
+    """
+    Send `phase_finished` for a phase started with `start()`.
+    """
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+
+    if template is None:
+        template = _current_template.get()
+    if template is not None:
+        sender = sender or type(template)
+        template_type = template_type or template.template_type
+        language = language or template.language
+
+    phase_finished.send(
+        sender=sender,
+        phase=phase,
+        duration=duration,
+        template_type=template_type,
+        language=language,
+        html_size=len(html.encode("utf8")) if html is not None else None,
+        attachments=len(attachments) if attachments is not None else None,
+        attachment_bytes=(
+            sum(_attachment_size(a) for a in attachments)
+            if attachments is not None
+            else None
+        ),
+    )
+
+
+def bind_template(template):
+    """
+    Make the template available to the phases that don't have access to it.
+
+    Returns a token for `unbind_template()`, or `None` if nobody is listening.
+    """
+    if not phase_finished.receivers:
+        return None
+    return _current_template.set(template)
+
+
+def unbind_template(token):
+    if token is not None:
+        _current_template.reset(token)
+
+
+def _attachment_size(attachment) -> int:
+    size = getattr(attachment, "size", None)
+    if size is not None:
+        # `LazyAttachment`, without reading the file
+        return size
+    if isinstance(attachment, tuple):
+        # `CIDAttachment` and Django's `(filename, content, mimetype)`
+        content = attachment[1]
+    else:
+        content = attachment.get_payload(decode=True)
+    if isinstance(content, str):
+        return len(content.encode("utf8"))
+    return len(content or b"")
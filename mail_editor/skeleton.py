@@ -0,0 +1,166 @@
+"""
+Two-phase rendering of messages.
+
+The base template is rendered and processed once, with a placeholder for the
+content. Each message then only processes its own (much smaller) content, which
+is spliced into the cached skeleton.
+
+In this mode the base template is rendered with `MAIL_EDITOR_BASE_CONTEXT` and
+`domain` only, the message context is not available to it.
+"""
+
+import os
+from typing import NamedTuple, Optional
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, loader
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .cache import LRUCache
+from .process import (
+    CIDAttachment,
+    ProcessedHTML,
+    extract_stylesheets,
+    process_fragment,
+    process_html,
+    process_text,
+)
+from .settings import settings
+from .text import PLACEHOLDER_MARKER
+from .utils import get_site_domain
+
+CONTENT_COMMENT = "mail-editor-content"
+CONTENT_PLACEHOLDER = f"<!--{CONTENT_COMMENT}-->"
+
+DEFAULT_BASE_TEMPLATE = "mail/_base.html"
+
+
+class Skeleton(NamedTuple):
+    head: str
+    tail: str
+    css: str
+    cid_attachments: list[CIDAttachment]
+    # (file path, mtime) of the base template and its stylesheets
+    dependencies: tuple[tuple[str, Optional[float]], ...]
+    # plain text around the content, `None` if it can't be split
+    text_head: Optional[str] = None
+    text_tail: Optional[str] = None
+
+    def is_stale(self) -> bool:
+        return any(_get_mtime(path) != mtime for path, mtime in self.dependencies)
+
+    def splice(self, fragment: ProcessedHTML) -> ProcessedHTML:
+        attachments = {att.cid: att for att in self.cid_attachments}
+        for att in fragment.cid_attachments:
+            attachments.setdefault(att.cid, att)
+        text = None
+        if fragment.text is not None and self.text_head is not None:
+            text = "\n\n".join(
+                filter(None, [self.text_head, fragment.text, self.text_tail])
+            )
+        return ProcessedHTML(
+            self.head + fragment.html + self.tail, list(attachments.values()), text
+        )
+
+
+_skeletons = LRUCache(max_entries=64)
+
+
+def get_skeleton(base_template_path, base_url, image_cache=None) -> Optional[Skeleton]:
+    """
+    Return the processed base template, or `None` if it can't be split around its content.
+    """
+    domain = get_site_domain()
+    # the base template may be translated (eg: `{% trans %}`)
+    key = (base_template_path or "", base_url, domain, get_language())
+
+    skeleton = _skeletons.get(key)
+    if skeleton is None or skeleton.is_stale():
+        skeleton = build_skeleton(base_template_path, base_url, domain, image_cache)
+        _skeletons.set(key, skeleton)
+
+    if skeleton.head is None:
+        return None
+    return skeleton
+
+
+def build_skeleton(base_template_path, base_url, domain, image_cache=None) -> Skeleton:
+    template_file = _find_template_file(base_template_path)
+
+    context = dict(settings.BASE_CONTEXT)
+    context.update({"domain": domain, "content": mark_safe(CONTENT_PLACEHOLDER)})
+    template_function = import_string(settings.BASE_TEMPLATE_LOADER)
+    html = template_function(base_template_path, context)
+
+    css, stylesheets = extract_stylesheets(html, base_url)
+    dependencies = tuple(
+        (path, _get_mtime(path)) for path in filter(None, [template_file, *stylesheets])
+    )
+
+    result = process_html(html, base_url, image_cache=image_cache, extract_text=False)
+    if result.html.count(CONTENT_PLACEHOLDER) != 1:
+        # the content isn't rendered (or rendered more than once)
+        return Skeleton(None, None, css, [], dependencies)
+
+    head, tail = result.html.split(CONTENT_PLACEHOLDER)
+
+    text_head = text_tail = None
+    text = process_text(html, base_url, placeholder=CONTENT_COMMENT)
+    if text.count(PLACEHOLDER_MARKER) == 1:
+        text_head, text_tail = (t.strip() for t in text.split(PLACEHOLDER_MARKER))
+
+    return Skeleton(
+        head,
+        tail,
+        css,
+        result.cid_attachments,
+        dependencies,
+        text_head,
+        text_tail,
+    )
+
+
+def render_with_skeleton(
+    skeleton: Skeleton, content: str, base_url: str, image_cache=None
+) -> ProcessedHTML:
+    fragment = process_fragment(
+        content, base_url, css=skeleton.css, image_cache=image_cache
+    )
+    return skeleton.splice(fragment)
+
+
+def clear_skeletons():
+    _skeletons.clear()
+
+
+def _find_template_file(template_path) -> Optional[str]:
+    for path in filter(None, [template_path, DEFAULT_BASE_TEMPLATE]):
+        try:
+            template = loader.get_template(path)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            continue
+        return getattr(template.origin, "name", None)
+    return None
+
+
+def _get_mtime(path) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+
+@receiver(setting_changed)
+def _clear_skeletons(setting, **kwargs):
+    if setting.startswith("MAIL_EDITOR_") or setting in (
+        "TEMPLATES",
+        "STATIC_URL",
+        "STATIC_ROOT",
+        "STATICFILES_DIRS",
+        "MEDIA_URL",
+        "MEDIA_ROOT",
+    ):
+        clear_skeletons()
@@ -0,0 +1,207 @@
+"""
+Fast path for templates that only substitute variables.
+
+Most subjects, and many bodies, contain nothing but text and `{{ var }}` or
+`{{ var.attr }}` placeholders. Those are compiled to a flat list of text segments
+and variable lookups, and rendered without Django's `Context` and node machinery.
+Lookups, calling, localization and escaping follow the Django template engine,
+anything else (tags, filters, literals, `string_if_invalid`) is rendered by it.
+"""
+
+import logging
+from html import escape
+from inspect import signature
+
+from django.template import Context
+from django.template.base import (
+    BaseContext,
+    TextNode,
+    Variable,
+    VariableDoesNotExist,
+    VariableNode,
+    render_value_in_context,
+)
+from django.utils.safestring import mark_safe
+
+logger = logging.getLogger(__name__)
+
+# the bottom layer of every Django `Context`
+BUILTINS = {"True": True, "False": False, "None": None}
+
+
+class _RenderOptions(object):
+    # the defaults of `Context`, as used by `render_value_in_context()`
+    autoescape = True
+    use_l10n = None
+    use_tz = None
+
+
+_options = _RenderOptions()
+
+
+class SubstitutionTemplate(object):
+    """
+    A compiled Django `Template` that can be rendered by substitution.
+
+    segments: text (`str`) and variable lookups (`tuple` of names)
+    """
+
+    def __init__(self, template, segments):
+        self.template = template
+        self.segments = segments
+
+    @property
+    def nodelist(self):
+        return self.template.nodelist
+
+    @property
+    def source(self):
+        return self.template.source
+
+    def render(self, context):
+        # a `Context` is rendered by Django, see `render_template()` for the fast path
+        return self.template.render(context)
+
+    def substitute(self, context) -> str:
+        """
+        Render with a mapping (eg: a `ChainMap`) as the context.
+        """
+        parts = []
+        # escaped plain string values of single names, that can be reused as-is
+        escaped = {}
+        for segment in self.segments:
+            if segment.__class__ is str:
+                parts.append(segment)
+                continue
+            output = escaped.get(segment)
+            if output is not None:
+                parts.append(output)
+                continue
+            try:
+                value = resolve_lookups(context, segment)
+            except VariableDoesNotExist:
+                # `string_if_invalid`
+                value = ""
+            except UnicodeDecodeError:
+                # like `VariableNode`
+                parts.append("")
+                continue
+            if value.__class__ is str:
+                # what `render_value_in_context()` comes down to for plain strings
+                output = escape(value)
+                if len(segment) == 1:
+                    escaped[segment] = output
+            else:
+                output = render_value_in_context(value, _options)
+            parts.append(output)
+        return mark_safe("".join(parts))
+
+
+def compile_substitution(template):
+    """
+    Return a `SubstitutionTemplate` for a Django `Template` that only substitutes
+    variables, or the template itself.
+    """
+    if template.engine.string_if_invalid:
+        return template
+
+    segments = []
+    for node in template.nodelist:
+        if isinstance(node, TextNode):
+            segments.append(node.s)
+        elif isinstance(node, VariableNode):
+            expression = node.filter_expression
+            var = expression.var
+            if (
+                expression.filters
+                or not isinstance(var, Variable)
+                or var.lookups is None
+                or var.translate
+            ):
+                return template
+            segments.append(var.lookups)
+        else:
+            return template
+    return SubstitutionTemplate(template, segments)
+
+
+def render_template(template, context) -> str:
+    """
+    Render a (compiled) template with a layered context (eg: a `ChainMap`).
+    """
+    if isinstance(template, SubstitutionTemplate):
+        # nothing is written to the context
+        return template.substitute(context)
+    return template.render(Context(context.new_child()))
+
+
+def resolve_lookups(context, lookups):
+    """
+    Resolve a variable like `django.template.base.Variable._resolve_lookup()` does.
+    """
+    current = context
+    try:  # catch-all for silent variable failures
+        for index, bit in enumerate(lookups):
+            if index == 0:
+                # the context itself only supports item lookups, like `Context.__getitem__()`
+                if bit in context:
+                    current = context[bit]
+                elif bit in BUILTINS:
+                    current = BUILTINS[bit]
+                else:
+                    raise VariableDoesNotExist(
+                        "Failed lookup for key [%s] in %r", (bit, context)
+                    )
+            else:
+                current = _lookup(current, bit)
+            if callable(current):
+                current = _call(current)
+    except Exception as e:
+        logger.debug(
+            "Exception while resolving variable '%s'.", ".".join(lookups), exc_info=True
+        )
+        if getattr(e, "silent_variable_failure", False):
+            return ""
+        raise
+    return current
+
+
+def _lookup(current, bit):
+    try:  # dictionary lookup
+        if not hasattr(type(current), "__getitem__"):
+            raise TypeError
+        return current[bit]
+    except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+        pass
+    try:  # attribute lookup
+        # don't return class attributes if the class is the context
+        if isinstance(current, BaseContext) and getattr(type(current), bit):
+            raise AttributeError
+        return getattr(current, bit)
+    except (TypeError, AttributeError):
+        # reraise if the exception was raised by a @property
+        if not isinstance(current, BaseContext) and bit in dir(current):
+            raise
+    try:  # list-index lookup
+        return current[int(bit)]
+    except (IndexError, ValueError, KeyError, TypeError):
+        raise VariableDoesNotExist("Failed lookup for key [%s] in %r", (bit, current))
+
+
+def _call(current):
+    if getattr(current, "do_not_call_in_templates", False):
+        return current
+    if getattr(current, "alters_data", False):
+        return ""
+    try:  # method call (assuming no args required)
+        return current()
+    except TypeError:
+        try:
+            current_signature = signature(current)
+        except ValueError:  # no signature found
+            return ""
+        try:
+            current_signature.bind()
+        except TypeError:  # arguments *were* required
+            return ""
+        raise
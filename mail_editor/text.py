@@ -0,0 +1,298 @@
+"""
+Plain text alternative of a message, rendered from its parsed HTML tree.
+
+Paragraphs, headings and tables are separated by blank lines, list items get a
+bullet (or number), links are followed by their URL and table cells on a single
+line are separated by " | ".
+"""
+
+import re
+from typing import Optional
+
+from lxml import etree
+
+# elements followed by a blank line
+PARAGRAPH_ELEMENTS = {
+    "address",
+    "blockquote",
+    "dl",
+    "figure",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "ol",
+    "p",
+    "pre",
+    "table",
+    "ul",
+}
+
+# elements starting on a new line
+LINE_ELEMENTS = {
+    "article",
+    "aside",
+    "body",
+    "caption",
+    "center",
+    "dd",
+    "div",
+    "dt",
+    "figcaption",
+    "footer",
+    "header",
+    "li",
+    "main",
+    "nav",
+    "section",
+    "tr",
+}
+
+SKIPPED_ELEMENTS = {"head", "script", "style", "template", "title"}
+
+# returned in place of the placeholder comment, see `html_to_text()`
+PLACEHOLDER_MARKER = "\x00"
+
+# not \s, non-breaking spaces are kept
+_WHITESPACE_CHARS = " \t\n\r\f"
+_WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+
+
+def _has_whitespace_controls(text: str) -> bool:
+    return "\n" in text or "\t" in text or "\r" in text or "\f" in text
+
+
+def html_to_text(root, placeholder: Optional[str] = None) -> str:
+    """
+    Render the text of an lxml (HTML) tree.
+
+    placeholder: text of a comment to render as `PLACEHOLDER_MARKER`, on its own
+                 paragraph, eg: to split the text of a base template around its content
+    """
+    renderer = _TextRenderer(placeholder)
+    renderer.render(root)
+    return renderer.writer.getvalue()
+
+
+class _TextWriter:
+    def __init__(self):
+        self.parts = []
+        # line breaks and space to write before the next text
+        self.newlines = 0
+        self.space = False
+        # list marker to write before the next text
+        self.prefix = ""
+        self.indent = ""
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+    def write(self, text: str):
+        """
+        Write inline text, collapsing its whitespace.
+        """
+        stripped = text.strip(_WHITESPACE_CHARS)
+        if stripped:
+            if "  " in stripped or _has_whitespace_controls(stripped):
+                stripped = _WHITESPACE.sub(" ", stripped)
+            if text[0] in _WHITESPACE_CHARS:
+                self.space = True
+            self.write_raw(stripped)
+        self.space = text[-1] in _WHITESPACE_CHARS
+
+    def write_raw(self, text: str):
+        """
+        Write text as-is, indenting its lines.
+        """
+        if self.parts:
+            if self.newlines:
+                self.parts.append("\n" * self.newlines + self.indent)
+            elif self.space:
+                self.parts.append(" ")
+        elif self.indent:
+            self.parts.append(self.indent)
+        if self.prefix:
+            self.parts.append(self.prefix)
+            self.prefix = ""
+        if self.indent:
+            text = text.replace("\n", "\n" + self.indent)
+        self.parts.append(text)
+        self.newlines = 0
+        self.space = False
+
+    def block(self, newlines: int):
+        self.newlines = max(self.newlines, newlines)
+        self.space = False
+
+    def line_break(self):
+        self.newlines = min(self.newlines + 1, 2)
+        self.space = False
+
+
+class _TextRenderer:
+    def __init__(self, placeholder=None):
+        self.placeholder = placeholder
+        self.writer = _TextWriter()
+        self.preformatted = 0
+        # the next number of each (ordered) list we're in, `None` for unordered lists
+        self.lists = []
+        self.renderers = {
+            "a": self.render_a,
+            "br": self.render_br,
+            "hr": self.render_hr,
+            "img": self.render_img,
+            "li": self.render_li,
+            "ol": self.render_ol,
+            "pre": self.render_pre,
+            "tr": self.render_tr,
+            "ul": self.render_ul,
+        }
+
+    def render(self, elem):
+        tag = elem.tag
+        if not isinstance(tag, str):
+            # comments and processing instructions
+            if tag is etree.Comment and self.placeholder == elem.text:
+                self.writer.block(2)
+                self.writer.write_raw(PLACEHOLDER_MARKER)
+                self.writer.block(2)
+            return
+        if tag in SKIPPED_ELEMENTS:
+            return
+
+        method = self.renderers.get(tag)
+        if method is not None:
+            method(elem)
+            return
+
+        newlines = 2 if tag in PARAGRAPH_ELEMENTS else 1 if tag in LINE_ELEMENTS else 0
+        if newlines:
+            self.writer.block(newlines)
+        self.render_children(elem)
+        if newlines:
+            self.writer.block(newlines)
+
+    def render_children(self, elem):
+        self.write(elem.text)
+        for child in elem:
+            self.render(child)
+            self.write(child.tail)
+
+    def write(self, text):
+        if not text:
+            return
+        if self.preformatted:
+            self.writer.write_raw(text)
+        else:
+            self.writer.write(text)
+
+    def render_br(self, elem):
+        self.writer.line_break()
+
+    def render_hr(self, elem):
+        self.writer.block(2)
+        self.writer.write_raw("-" * 20)
+        self.writer.block(2)
+
+    def render_img(self, elem):
+        alt = elem.get("alt")
+        if alt:
+            self.writer.write(alt)
+
+    def render_pre(self, elem):
+        self.writer.block(2)
+        self.preformatted += 1
+        self.render_children(elem)
+        self.preformatted -= 1
+        self.writer.block(2)
+
+    def render_a(self, elem):
+        start = len(self.writer.parts)
+        self.render_children(elem)
+        text = "".join(self.writer.parts[start:]).strip()
+
+        url = _get_link_url(elem.get("href"), text)
+        if url:
+            self.writer.write(f" ({url})" if text else f" {url}")
+
+    def render_ul(self, elem):
+        self._render_list(elem, None)
+
+    def render_ol(self, elem):
+        try:
+            start = int(elem.get("start") or 1)
+        except ValueError:
+            start = 1
+        self._render_list(elem, start)
+
+    def _render_list(self, elem, number):
+        writer = self.writer
+        writer.block(1 if self.lists else 2)
+        indent = writer.indent
+        if self.lists:
+            writer.indent += "  "
+        self.lists.append(number)
+        self.render_children(elem)
+        self.lists.pop()
+        writer.indent = indent
+        writer.block(1 if self.lists else 2)
+
+    def render_li(self, elem):
+        writer = self.writer
+        writer.block(1)
+        number = self.lists[-1] if self.lists else None
+        if number is None:
+            writer.prefix = "- "
+        else:
+            writer.prefix = f"{number}. "
+            self.lists[-1] += 1
+        self.render_children(elem)
+        writer.prefix = ""
+        writer.block(1)
+
+    def render_tr(self, elem):
+        cells = []
+        for cell in elem:
+            if cell.tag not in ("td", "th"):
+                continue
+            text = self._render_detached(cell)
+            if text.strip():
+                cells.append(text)
+
+        writer = self.writer
+        if all("\n" not in text for text in cells):
+            writer.block(1)
+            if cells:
+                writer.write_raw(" | ".join(cells))
+            writer.block(1)
+        else:
+            # cells with blocks of their own, eg: layout tables
+            for text in cells:
+                writer.block(2)
+                writer.write_raw(text)
+            writer.block(2)
+
+    def _render_detached(self, elem) -> str:
+        writer = self.writer
+        self.writer = _TextWriter()
+        try:
+            self.render_children(elem)
+            return self.writer.getvalue()
+        finally:
+            self.writer = writer
+
+
+def _get_link_url(href, text) -> Optional[str]:
+    if not href or href == text:
+        return None
+    if href.startswith(("http://", "https://")):
+        return href
+    if href.startswith(("mailto:", "tel:")):
+        address = href.split(":", 1)[1].split("?", 1)[0]
+        return address if address and address != text else None
+    # eg: javascript: or cid:
+    return None
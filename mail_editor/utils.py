@@ -1,26 +1,46 @@
-from django.utils.safestring import mark_safe
+from django.apps import apps
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-from .settings import get_config
+from .registry import get_registry
 
 
 def variable_help_text(template_type):
-    subject_html = "<ul>"
-    body_html = "<label>Body variables:</label> <ul>"
+    return get_registry().get_help_text(template_type)
 
-    template_conf = get_config().get(template_type)
-    if template_conf:
-        subject_variables = template_conf.get("subject")
-        body_variables = template_conf.get("body")
 
-        if subject_variables:
-            for variable in subject_variables:
-                subject_html += variable.get_html_list_item()
+_site_domain = None
 
-        if body_variables:
-            for variable in body_variables:
-                body_html += variable.get_html_list_item()
 
-    subject_html += "</ul>"
-    body_html += "</ul>"
+def get_site_domain():
+    """
+    Return the domain of the current site, cached until a `Site` is saved or deleted.
+    """
+    global _site_domain
 
-    return mark_safe("{}<br><br>{}".format(subject_html, body_html))
+    if _site_domain is not None:
+        return _site_domain
+
+    # TODO: This only works when sites-framework is installed.
+    try:
+        domain = get_current_site(None).domain
+    except Exception:
+        if apps.is_installed("django.contrib.sites"):
+            # might be temporary, eg: the database isn't available (yet)
+            return ""
+        domain = ""
+
+    _site_domain = domain
+    return domain
+
+
+def clear_site_domain(**kwargs):
+    global _site_domain
+    _site_domain = None
+
+
+@receiver(setting_changed)
+def _clear_site_domain(setting, **kwargs):
+    if setting in ("SITE_ID", "INSTALLED_APPS"):
+        clear_site_domain()
@@ -2,35 +2,54 @@ from django import forms
 from django.contrib import admin, messages
 from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import View
 from django.views.generic.detail import DetailView, SingleObjectMixin
 from django.views.generic.edit import FormView
 
+from .cache import content_hash
 from .models import MailTemplate
-from .process import process_html
-from .settings import settings
+from .preview import get_preview
 from .utils import variable_help_text
 
 
 class TemplateVariableView(View):
     def get(self, request, *args, **kwargs):
         variables = variable_help_text(kwargs["template_type"])
-        return HttpResponse(variables)
+        return conditional_response(
+            request, content_hash(variables), lambda: HttpResponse(variables)
+        )
 
 
 class TemplateBrowserPreviewView(SingleObjectMixin, View):
     model = MailTemplate
 
     def get(self, request, *args, **kwargs):
-        template = self.get_object()
-        subject_ctx, body_ctx = template.get_preview_contexts()
-
-        _subject, body = template.render(body_ctx, subject_ctx)
-        body, _attachments = process_html(
-            body, settings.BASE_HOST, extract_attachments=False
+        preview = get_preview(self.get_object())
+        return conditional_response(
+            request,
+            preview.etag,
+            lambda: HttpResponse(preview.html, content_type="text/html"),
         )
-        return HttpResponse(body, content_type="text/html")
+
+
+def conditional_response(request, etag, get_response):
+    """
+    Answer with a 304 if the client has the current version, or else with `get_response()`.
+
+    The response may be stored by the browser, but must be revalidated on every use.
+    """
+    etag = quote_etag(etag)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class TemplateEmailPreviewForm(forms.Form):
@@ -73,7 +92,8 @@ class TemplateEmailPreviewFormView(FormView, DetailView):
         )
 
         subject_ctx, body_ctx = self.object.get_preview_contexts()
-        subject, _body = self.object.render(body_ctx, subject_ctx)
+        # the body is rendered (and cached) by the preview in the iframe
+        subject = self.object.render_subject(body_ctx, subject_ctx)
         # our own context data
         ctx.update(
             {
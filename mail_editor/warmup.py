@@ -0,0 +1,163 @@
+"""
+Warm-up of the process-wide caches, so the first message of a new worker isn't slow.
+
+All templates are loaded with one query (filling the resolution cache when enabled),
+their subjects and bodies are compiled and the stylesheets and images referenced by the
+templates and their base templates are read. With `MAIL_EDITOR_TWO_PHASE_RENDERING`
+the processed base templates are kept as skeletons.
+
+Run it with the `mail_editor_warmup` management command, or set
+`MAIL_EDITOR_WARMUP = True` to warm up in a background thread when Django starts
+(but not for management commands, except `runserver`).
+"""
+
+import logging
+import threading
+import time
+import tracemalloc
+from typing import NamedTuple, Optional
+
+from django.apps import apps
+from django.db import connections
+
+from . import process
+from .cache import compiled_templates
+from .models import MailTemplate
+from .process import process_fragment
+from .settings import settings
+from .skeleton import DEFAULT_BASE_TEMPLATE, build_skeleton, get_skeleton
+from .utils import get_site_domain
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupReport(NamedTuple):
+    templates: int
+    # compiled subjects and bodies
+    compiled: int
+    # "<template>: <error>" of templates that couldn't be compiled or processed
+    errors: list[str]
+    base_templates: int
+    # only built with `MAIL_EDITOR_TWO_PHASE_RENDERING`
+    skeletons: int
+    # cached after the warm-up
+    stylesheets: int
+    images: int
+    # seconds
+    duration: float
+    # peak bytes allocated during the warm-up, `None` if not measured
+    memory: Optional[int] = None
+
+    def __str__(self):
+        memory = "" if self.memory is None else f", {self.memory / 1024:.1f} KiB"
+        return (
+            f"Warmed up {self.templates} template(s), {self.compiled} compiled, "
+            f"{self.base_templates} base template(s), {self.skeletons} skeleton(s), {self.stylesheets} stylesheet(s) and "
+            f"{self.images} image(s) cached in {self.duration * 1000:.1f}ms{memory}"
+        )
+
+
+def warm_up(measure_memory=True) -> WarmupReport:
+    """
+    Fill the caches for all templates in the database.
+
+    measure_memory: trace the allocations with `tracemalloc`, which slows down every
+                    thread of the process and counts their allocations too
+    """
+    tracing = measure_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif measure_memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+
+    try:
+        templates = MailTemplate.objects.preload()
+        base_url = settings.BASE_HOST
+
+        compiled = 0
+        errors = []
+        base_template_paths = set()
+        for template in templates:
+            engine = template.engine
+            for source in (template.subject, template.body):
+                try:
+                    compiled_templates.get(template.pk, source, engine)
+                except engine.syntax_error as exc:
+                    errors.append(f"{template}: {exc}")
+                else:
+                    compiled += 1
+            base_template_paths.add(template.base_template_path or None)
+
+            # read the stylesheets and images the body refers to
+            try:
+                process_fragment(template.body, base_url, extract_text=False)
+            except Exception as exc:
+                # eg: an `InlineError` with `DEBUG`, the source isn't rendered
+                errors.append(f"{template}: {exc}")
+
+        # read the stylesheets and images the base templates refer to
+        base_templates = skeletons = 0
+        for path in base_template_paths:
+            try:
+                if settings.TWO_PHASE_RENDERING:
+                    if get_skeleton(path, base_url) is not None:
+                        skeletons += 1
+                else:
+                    build_skeleton(path, base_url, get_site_domain())
+            except Exception as exc:
+                errors.append(f"{path or DEFAULT_BASE_TEMPLATE}: {exc}")
+            else:
+                base_templates += 1
+
+        duration = time.perf_counter() - started
+        memory = None
+        if tracing:
+            memory = tracemalloc.get_traced_memory()[1]
+        elif measure_memory:
+            memory = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    return WarmupReport(
+        len(templates),
+        compiled,
+        errors,
+        base_templates,
+        skeletons,
+        len(process._stylesheets),
+        len(process._images),
+        duration,
+        memory,
+    )
+
+
+def start_warmup() -> threading.Thread:
+    """
+    Warm up in a background thread, as soon as the app registry is ready.
+    """
+    thread = threading.Thread(
+        target=_warm_up_when_ready, name="mail-editor-warmup", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _warm_up_when_ready():
+    # started from `AppConfig.ready()`, the database shouldn't be used before all apps are
+    while not apps.ready:
+        time.sleep(0.01)
+    try:
+        # tracing the memory would slow down the requests the worker is already serving
+        report = warm_up(measure_memory=False)
+    except Exception:
+        # never keep a worker from starting
+        logger.exception("Mail templates could not be warmed up")
+    else:
+        logger.info("%s", report)
+        for error in report.errors:
+            logger.warning("Mail template could not be warmed up: %s", error)
+    finally:
+        connections.close_all()
@@ -10,6 +10,7 @@ from django_webtest import WebTest
 
 from mail_editor.helpers import find_template
 from mail_editor.models import MailTemplate
+from mail_editor.preview import build_preview
 
 CONFIG = {
     "test_template": {
@@ -147,6 +148,19 @@ class AdminTestCase(WebTest):
 
         response = self.app.get(url, user=self.super_user)
 
+    def test_variable_view__conditional(self):
+        url = reverse("admin:mailtemplate_variables", args=["test_template"])
+
+        response = self.app.get(url, user=self.super_user)
+        self.assertIn("private", response.headers["Cache-Control"])
+        self.assertNotIn("no-store", response.headers["Cache-Control"])
+
+        etag = response.headers["ETag"]
+        response = self.app.get(
+            url, user=self.super_user, headers={"If-None-Match": etag}, status=304
+        )
+        self.assertEqual(response.headers["ETag"], etag)
+
     def test_preview_view(self):
         template = find_template("test_template")
 
@@ -174,3 +188,42 @@ class AdminTestCase(WebTest):
         response = self.app.get(url, user=self.super_user)
 
         self.assertIn(str(_("Test mail sent from testcase with --id--")), response.text)
+
+    def test_render_view__conditional(self):
+        template = find_template("test_template")
+        url = reverse("admin:mailtemplate_render", args=[template.id])
+
+        response = self.app.get(url, user=self.super_user)
+        etag = response.headers["ETag"]
+        # the render time of a worker would give a stale 304 for a reverted template
+        self.assertNotIn("Last-Modified", response.headers)
+
+        with self.subTest("not modified"):
+            with patch("mail_editor.preview.build_preview", wraps=build_preview) as m:
+                self.app.get(
+                    url,
+                    user=self.super_user,
+                    headers={"If-None-Match": etag},
+                    status=304,
+                )
+            # served from the render cache
+            m.assert_not_called()
+
+        with self.subTest("changed template"):
+            template.body = "changed"
+            template.save()
+
+            response = self.app.get(
+                url, user=self.super_user, headers={"If-None-Match": etag}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers["ETag"], etag)
+            self.assertIn("changed", response.text)
+
+        with self.subTest("only If-Modified-Since"):
+            response = self.app.get(
+                url,
+                user=self.super_user,
+                headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+            )
+            self.assertEqual(response.status_code, 200)
@@ -0,0 +1,94 @@
+import email
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from mail_editor.attachments import CHUNK_SIZE, LazyAttachment, clear_attachment_cache
+from mail_editor.models import MailTemplate
+
+
+class LazyAttachmentTestCase(TestCase):
+    def setUp(self):
+        clear_attachment_cache()
+        self.addCleanup(clear_attachment_cache)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "invoice.pdf")
+        self.content = os.urandom(CHUNK_SIZE * 2 + 100)
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+
+        self.template = MailTemplate(
+            template_type="template", subject="Invoice", body="<p>Invoice</p>"
+        )
+
+    def get_attachment(self, message):
+        parsed = email.message_from_bytes(message.message().as_bytes())
+        return next(part for part in parsed.walk() if part.get_filename())
+
+    def test_build_message(self):
+        message = self.template.build_message(
+            ["foo@example.com"], {}, attachments=[LazyAttachment(self.path)]
+        )
+
+        part = self.get_attachment(message)
+        self.assertEqual(part.get_content_type(), "application/pdf")
+        self.assertEqual(part.get_filename(), "invoice.pdf")
+        self.assertEqual(part.get_payload(decode=True), self.content)
+
+    def test_read_when_serialized(self):
+        with patch("mail_editor.attachments.open", create=True) as m:
+            message = self.template.build_message(
+                ["foo@example.com"], {}, attachments=[LazyAttachment(self.path)]
+            )
+            message.message()
+        m.assert_not_called()
+
+        # so the file can still change
+        with open(self.path, "wb") as f:
+            f.write(b"changed")
+        part = self.get_attachment(message)
+        self.assertEqual(part.get_payload(decode=True), b"changed")
+
+    def test_read_once(self):
+        messages = [
+            self.template.build_message(
+                [f"foo{i}@example.com"],
+                {},
+                attachments=[LazyAttachment(self.path, "application/octet-stream")],
+            )
+            for i in range(3)
+        ]
+
+        with patch("mail_editor.attachments.open", create=True, wraps=open) as m:
+            for message in messages:
+                part = self.get_attachment(message)
+                self.assertEqual(part.get_content_type(), "application/octet-stream")
+                self.assertEqual(part.get_payload(decode=True), self.content)
+        m.assert_called_once()
+
+    @override_settings(MAIL_EDITOR_ATTACHMENT_CACHE_SIZE=1000)
+    def test_read_once__over_budget(self):
+        message = self.template.build_message(
+            ["foo@example.com"], {}, attachments=[LazyAttachment(self.path)]
+        )
+
+        with patch("mail_editor.attachments.open", create=True, wraps=open) as m:
+            part = self.get_attachment(message)
+        self.assertEqual(part.get_payload(decode=True), self.content)
+        m.assert_called_once()
+
+    def test_send_mass(self):
+        attachment = LazyAttachment(self.path, filename="factuur €.pdf")
+        items = [([f"foo{i}@example.com"], {}, None, [attachment]) for i in range(2)]
+
+        self.template.send_mass(items)
+
+        self.assertEqual(len(mail.outbox), 2)
+        part = self.get_attachment(mail.outbox[1])
+        self.assertEqual(part.get_filename(), "factuur €.pdf")
+        self.assertEqual(part.get_payload(decode=True), self.content)
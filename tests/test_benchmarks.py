@@ -0,0 +1,55 @@
+from django.test import SimpleTestCase
+
+from benchmarks.compare import compare
+from benchmarks.run import CASES, run
+
+
+class BenchmarkTestCase(SimpleTestCase):
+    def test_run(self):
+        data = run(sizes=["small"], iterations=2, warmup=0, memory_iterations=1)
+
+        self.assertEqual([r["name"] for r in data["results"]], list(CASES))
+        for result in data["results"]:
+            self.assertEqual(result["size"], "small")
+            self.assertLessEqual(result["p50_ms"], result["max_ms"])
+            self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_compare(self):
+        before = {
+            "results": [
+                {
+                    "name": "render",
+                    "size": "small",
+                    "p50_ms": 2.0,
+                    "peak_memory_bytes": 10,
+                },
+                {
+                    "name": "removed",
+                    "size": "small",
+                    "p50_ms": 1.0,
+                    "peak_memory_bytes": 10,
+                },
+            ]
+        }
+        after = {
+            "results": [
+                {
+                    "name": "render",
+                    "size": "small",
+                    "p50_ms": 3.0,
+                    "peak_memory_bytes": 5,
+                },
+                {
+                    "name": "added",
+                    "size": "small",
+                    "p50_ms": 1.0,
+                    "peak_memory_bytes": 10,
+                },
+            ]
+        }
+
+        rows = compare(before, after)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["change"], 50.0)
+        self.assertEqual(rows[0]["peak_memory_change"], -5)
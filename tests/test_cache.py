@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+from django.template import Template
+from django.test import TestCase, override_settings
+
+from mail_editor.cache import LRUCache, compiled_templates
+from mail_editor.models import MailTemplate
+
+
+class LRUCacheTestCase(TestCase):
+    def test_max_entries(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+
+        cache.set("c", 3)
+
+        # "b" is the least recently used
+        self.assertEqual(cache.keys(), ["a", "c"])
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.set("a", b"12345")
+        cache.set("b", b"12345")
+        self.assertEqual(cache.bytes, 10)
+
+        cache.set("c", b"123")
+        self.assertEqual(cache.keys(), ["b", "c"])
+        self.assertEqual(cache.bytes, 8)
+
+        # too large to fit at all
+        cache.set("d", b"12345678901")
+        self.assertNotIn("d", cache)
+        self.assertEqual(cache.bytes, 8)
+
+        cache.set("b", b"1")
+        self.assertEqual(cache.bytes, 4)
+        self.assertEqual(cache.pop("b"), b"1")
+        self.assertEqual(cache.bytes, 3)
+
+
+class CompiledTemplateCacheTestCase(TestCase):
+    def setUp(self):
+        compiled_templates.clear()
+
+    def tearDown(self):
+        compiled_templates.clear()
+
+    def test_render_compiles_once(self):
+        template = MailTemplate.objects.create(
+            template_type="template", subject="{{ foo }}", body="{{ bar }}"
+        )
+        compiled_templates.clear()
+
+        with patch("mail_editor.engines.Template", wraps=Template) as m:
+            template.render({"foo": "1", "bar": "2"})
+            template.render({"foo": "3", "bar": "4"})
+            # a fresh instance of the same row shares the compiled templates
+            MailTemplate.objects.get(pk=template.pk).render({})
+
+        self.assertEqual(m.call_count, 2)
+
+    def test_save_drops_stale_templates(self):
+        template = MailTemplate.objects.create(
+            template_type="template", subject="{{ foo }}", body="{{ bar }}"
+        )
+        subject, _body = template.render({"foo": "1"})
+        self.assertEqual(subject, "1")
+
+        template.subject = "changed {{ foo }}"
+        template.save()
+        self.assertEqual(len(compiled_templates), 1)
+
+        subject, _body = template.render({"foo": "1"})
+        self.assertEqual(subject, "changed 1")
+
+    def test_delete_drops_templates(self):
+        template = MailTemplate.objects.create(
+            template_type="template", subject="{{ foo }}", body="{{ bar }}"
+        )
+        template.render({})
+        self.assertEqual(len(compiled_templates), 2)
+
+        template.delete()
+        self.assertEqual(len(compiled_templates), 0)
+
+    def test_clean_compiles_for_render(self):
+        template = MailTemplate(
+            template_type="template", subject="{{ foo }}", body="{{ bar }}"
+        )
+        template.clean()
+        template.save()
+
+        with patch("mail_editor.engines.Template") as m:
+            subject, _body = template.render({"foo": "1"})
+
+        m.assert_not_called()
+        self.assertEqual(subject, "1")
+
+    @override_settings(MAIL_EDITOR_TEMPLATE_CACHE_SIZE=2)
+    def test_cache_size(self):
+        for i in range(3):
+            MailTemplate(
+                template_type="template", subject=f"{i}", body=f"body {i}"
+            ).render({})
+
+        self.assertEqual(len(compiled_templates), 2)
@@ -0,0 +1,78 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from mail_editor.models import MailTemplate
+
+CONFIG = {
+    "first": {
+        "subject_default": "First subject",
+        "body_default": "First body",
+        "subject": [],
+        "body": [],
+    },
+    "second": {
+        "subject_default": "Second subject",
+        "body_default": "Second body",
+        "subject": [],
+        "body": [],
+    },
+}
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG)
+class AddMissingTemplatesTestCase(TestCase):
+    def setUp(self):
+        site_patch = patch("mail_editor.helpers.get_current_site")
+        site_patch.start()
+        self.addCleanup(patch.stopall)
+
+    @override_settings(LANGUAGES=[("nl", "Dutch"), ("en", "English")])
+    def test_languages(self):
+        MailTemplate.objects.create(
+            template_type="first", language="nl", subject="Changed", body="Changed"
+        )
+        stdout = StringIO()
+
+        with patch("mail_editor.helpers.get_body", return_value="Body") as get_body:
+            with self.assertNumQueries(4):
+                call_command("add_missing_templates", stdout=stdout, verbosity=2)
+
+        # once per type
+        self.assertEqual(get_body.call_count, 2)
+        self.assertEqual(
+            sorted(
+                MailTemplate.objects.values_list("template_type", "language", "subject")
+            ),
+            [
+                ("first", "en", "First subject"),
+                ("first", "nl", "Changed"),
+                ("second", "en", "Second subject"),
+                ("second", "nl", "Second subject"),
+            ],
+        )
+        self.assertIn("Created first - en", stdout.getvalue())
+        self.assertIn("Created 3 missing template(s)", stdout.getvalue())
+
+        stdout = StringIO()
+        with self.assertNumQueries(1):
+            call_command("add_missing_templates", stdout=stdout)
+        self.assertEqual(MailTemplate.objects.count(), 4)
+        self.assertIn("Created 0 missing template(s)", stdout.getvalue())
+
+    @override_settings(LANGUAGES=[("nl", "Dutch")])
+    def test_single_language(self):
+        MailTemplate.objects.create(
+            template_type="first", language=None, subject="Changed", body="Changed"
+        )
+
+        call_command("add_missing_templates", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(MailTemplate.objects.values_list("template_type", "language")),
+            [("first", None), ("second", None)],
+        )
+        template = MailTemplate.objects.get(template_type="second")
+        self.assertIn("Second body", template.body)
@@ -0,0 +1,166 @@
+from unittest import skipIf
+from unittest.mock import Mock
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from mail_editor.cache import compiled_templates
+from mail_editor.engines import DjangoEngine, get_engine
+from mail_editor.mail_template import validate_template
+from mail_editor.models import MailTemplate
+from mail_editor.substitution import SubstitutionTemplate
+from mail_editor.utils import get_site_domain
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+order_provider = Mock(return_value="ORDER")
+
+CONFIG = {
+    "template": {
+        "subject": [{"name": "name", "required": True}],
+        "body": [
+            {"name": "order", "provider": order_provider},
+        ],
+    },
+    "jinja": {
+        "engine": "jinja2",
+        "subject": [{"name": "name", "required": True}],
+        "body": [
+            {"name": "order", "provider": order_provider},
+        ],
+    },
+}
+
+
+class GetEngineTestCase(SimpleTestCase):
+    def test_default(self):
+        self.assertIsInstance(get_engine(), DjangoEngine)
+        self.assertIs(get_engine(), get_engine("django"))
+
+    def test_import_path(self):
+        self.assertIsInstance(
+            get_engine("mail_editor.engines.DjangoEngine"), DjangoEngine
+        )
+
+    @skipIf(jinja2 is not None, "Jinja2 is installed")
+    def test_jinja2_not_installed(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_engine("jinja2")
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG)
+class DjangoEngineTestCase(TestCase):
+    def test_render(self):
+        template = MailTemplate(
+            template_type="template",
+            subject="Hello {{ name }}",
+            body="{% if order %}<p>{{ order }}</p>{% endif %}",
+        )
+
+        subject, body = template.render({"name": "<Jane>"})
+
+        self.assertEqual(subject, "Hello &lt;Jane&gt;")
+        self.assertIn("<p>ORDER</p>", body)
+        self.assertIsInstance(
+            compiled_templates.get(None, template.subject, template.engine),
+            SubstitutionTemplate,
+        )
+
+
+@skipIf(jinja2 is None, "Jinja2 is not installed")
+@override_settings(MAIL_EDITOR_CONF=CONFIG)
+class Jinja2EngineTestCase(TestCase):
+    def setUp(self):
+        order_provider.reset_mock()
+
+    def test_engine_per_template_type(self):
+        self.assertEqual(MailTemplate(template_type="template").engine.name, "django")
+        self.assertEqual(MailTemplate(template_type="jinja").engine.name, "jinja2")
+
+    @override_settings(MAIL_EDITOR_ENGINE="jinja2")
+    def test_engine_setting(self):
+        self.assertEqual(MailTemplate(template_type="template").engine.name, "jinja2")
+
+    def test_render(self):
+        template = MailTemplate(
+            template_type="jinja",
+            subject="Hello {{ name }}",
+            body=(
+                "{% for item in items %}<p>{{ loop.index }}: {{ item|upper }}</p>{% endfor %}"
+                "{{ missing.attr }}<b>{{ order }}</b><i>{{ domain }}</i>"
+            ),
+        )
+
+        subject, body = template.render({"name": "<Jane>", "items": ["a", "<b>"]})
+
+        self.assertEqual(subject, "Hello &lt;Jane&gt;")
+        self.assertIn(
+            "<p>1: A</p><p>2: &lt;B&gt;</p><b>ORDER</b><i>{}</i>".format(
+                get_site_domain()
+            ),
+            body,
+        )
+        order_provider.assert_called_once()
+
+    def test_render__sandboxed(self):
+        template = MailTemplate(
+            template_type="jinja",
+            subject="{{ name }}",
+            body="{{ name.__class__() }}",
+        )
+
+        with self.assertRaises(jinja2.exceptions.SecurityError):
+            template.render({"name": "Jane"})
+
+    def test_compiled_once(self):
+        template = MailTemplate(
+            template_type="jinja", subject="{{ name }}", body="{{ name }}"
+        )
+        engine = template.engine
+
+        compiled = compiled_templates.get(None, template.subject, engine)
+
+        self.assertIs(compiled_templates.get(None, template.subject, engine), compiled)
+        # the same source is compiled separately for every engine
+        self.assertIsNot(compiled_templates.get(None, template.subject), compiled)
+
+    def test_validate(self):
+        template = MailTemplate(
+            template_type="jinja", subject="{{ name.first }}", body="{{ order }}"
+        )
+
+        validate_template(template)
+
+    def test_validate__missing_variable(self):
+        template = MailTemplate(
+            template_type="jinja",
+            subject="{% if name %}Hello{% endif %}",
+            body="{{ order }}",
+        )
+
+        with self.assertRaises(ValidationError) as excinfo:
+            validate_template(template)
+
+        self.assertEqual(
+            excinfo.exception.message,
+            "These variables are required, but missing: {{ name }}",
+        )
+
+    def test_validate__syntax_error(self):
+        template = MailTemplate(
+            template_type="jinja",
+            subject="{{ name }}",
+            body="<p>\n{% for item in items %}\n</p>",
+        )
+
+        with self.assertRaises(ValidationError) as excinfo:
+            validate_template(template)
+
+        self.assertEqual(excinfo.exception.code, "syntax_error")
+        self.assertIn("TemplateSyntaxError", excinfo.exception.message)
+        self.assertIn(
+            "&gt;&gt;&gt;&gt;{% for item in items %}", excinfo.exception.message
+        )
@@ -0,0 +1,188 @@
+import base64
+import io
+import os
+import tempfile
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from mail_editor import images
+from mail_editor.process import cid_for_bytes, clear_image_cache, process_html
+from mail_editor.signals import image_optimized
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def make_image(image_format, size=(800, 400)):
+    image = Image.effect_noise(size, 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, image_format, quality=100)
+    return output.getvalue()
+
+
+def data_uri(content, content_type):
+    return f"data:{content_type};base64,{base64.b64encode(content).decode()}"
+
+
+@skipIf(Image is None, "Pillow is not installed")
+class OptimizeImagesTestCase(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+
+        settings_override = override_settings(
+            MAIL_EDITOR_OPTIMIZE_IMAGES=True,
+            MAIL_EDITOR_IMAGE_OPTIMIZATION_CACHE_DIR=self.cache_dir,
+            MAIL_EDITOR_IMAGE_MAX_DIMENSION=500,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for clear in [images.clear_optimized_images, clear_image_cache]:
+            clear()
+            self.addCleanup(clear)
+
+    def get_attachment(self, html):
+        result = process_html(html, "http://testserver")
+        self.assertEqual(len(result.cid_attachments), 1)
+        attachment = result.cid_attachments[0]
+        self.assertIn(f'src="cid:{attachment.cid}"', result.html)
+        return attachment
+
+    def test_declared_dimensions(self):
+        content = make_image("PNG")
+
+        attachment = self.get_attachment(
+            f'<img src="{data_uri(content, "image/png")}" width="200px">'
+        )
+
+        self.assertEqual(attachment.content_type, "image/png")
+        self.assertLess(len(attachment.content), len(content))
+        self.assertEqual(attachment.cid, cid_for_bytes(attachment.content))
+        with Image.open(io.BytesIO(attachment.content)) as image:
+            self.assertEqual(image.size, (200, 100))
+
+    def test_max_dimension(self):
+        content = make_image("JPEG")
+
+        attachment = self.get_attachment(
+            f'<img src="{data_uri(content, "image/jpeg")}" width="100%">'
+        )
+
+        self.assertEqual(attachment.content_type, "image/jpeg")
+        with Image.open(io.BytesIO(attachment.content)) as image:
+            self.assertEqual(image.size, (500, 250))
+
+    def test_cached_on_disk(self):
+        content = make_image("PNG")
+        html = f'<img src="{data_uri(content, "image/png")}" width="200">'
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(kwargs)
+
+        image_optimized.connect(receiver)
+        self.addCleanup(image_optimized.disconnect, receiver)
+
+        attachment = self.get_attachment(html)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertEqual(received[0]["original_size"], len(content))
+        self.assertEqual(received[0]["optimized_size"], len(attachment.content))
+
+        # eg: another process
+        images.clear_optimized_images()
+        with patch("mail_editor.images._optimize") as m:
+            self.assertEqual(self.get_attachment(html), attachment)
+        m.assert_not_called()
+        self.assertEqual(len(received), 1)
+
+    def test_keep_smaller_original(self):
+        content = make_image("PNG", size=(10, 10))
+        with Image.open(io.BytesIO(content)) as image:
+            output = io.BytesIO()
+            image.save(output, "PNG", optimize=True)
+            content = output.getvalue()
+
+        attachment = self.get_attachment(
+            f'<img src="{data_uri(content, "image/png")}">'
+        )
+
+        self.assertEqual(attachment.content, content)
+
+    def test_invalid_image(self):
+        content = b"\x89PNG not really"
+
+        attachment = self.get_attachment(
+            f'<img src="{data_uri(content, "image/png")}">'
+        )
+
+        self.assertEqual(attachment.content, content)
+
+    @override_settings(MAIL_EDITOR_OPTIMIZE_IMAGES=False)
+    def test_disabled(self):
+        content = make_image("PNG")
+
+        attachment = self.get_attachment(
+            f'<img src="{data_uri(content, "image/png")}" width="200">'
+        )
+
+        self.assertEqual(attachment.content, content)
+
+
+@skipIf(not hasattr(os, "getuid"), "POSIX only")
+@override_settings(MAIL_EDITOR_IMAGE_OPTIMIZATION_CACHE_DIR=None)
+class CacheDirTestCase(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+        gettempdir_patch = patch(
+            "mail_editor.images.tempfile.gettempdir", return_value=self.temp_dir
+        )
+        gettempdir_patch.start()
+        self.addCleanup(gettempdir_patch.stop)
+
+        self.directory = os.path.join(
+            self.temp_dir, f"mail_editor_images-{os.getuid()}"
+        )
+
+    def test_private(self):
+        self.assertEqual(images._get_cache_dir(), self.directory)
+        self.assertEqual(os.stat(self.directory).st_mode & 0o777, 0o700)
+
+        images._write_cached("key", b"content")
+        self.assertEqual(images._read_cached("key"), b"content")
+
+    def test_accessible_by_others(self):
+        os.mkdir(self.directory)
+        os.chmod(self.directory, 0o777)
+        with open(os.path.join(self.directory, "key"), "wb") as f:
+            f.write(b"planted")
+
+        with self.assertLogs("mail_editor.images", "WARNING"):
+            self.assertIsNone(images._get_cache_dir())
+        self.assertIsNone(images._read_cached("key"))
+
+    def test_symlink(self):
+        target = os.path.join(self.temp_dir, "target")
+        os.mkdir(target, 0o700)
+        os.symlink(target, self.directory)
+
+        with self.assertLogs("mail_editor.images", "WARNING"):
+            self.assertIsNone(images._get_cache_dir())
+
+    def test_other_owner(self):
+        # created by someone else, the directory of another uid is owned by us
+        other_uid = os.getuid() + 1
+        os.mkdir(os.path.join(self.temp_dir, f"mail_editor_images-{other_uid}"), 0o700)
+
+        with patch("mail_editor.images.os.getuid", return_value=other_uid):
+            with self.assertLogs("mail_editor.images", "WARNING"):
+                self.assertIsNone(images._get_cache_dir())
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase
+
+from mail_editor import pool
+from mail_editor.models import MailTemplate
+from mail_editor.pool import shutdown_pool
+
+
+class ProcessPoolTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_pool()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.template = MailTemplate.objects.create(
+            template_type="template",
+            subject="Hello {{ name }}",
+            body='<p>{{ name }}</p><img src="/static/logo.png"><a href="/foo">foo</a>',
+        )
+
+    def test_render_many(self):
+        items = [({"name": f"name {i}"}, None) for i in range(7)]
+
+        results = list(self.template.render_many(items, processes=2, chunk_size=2))
+
+        self.assertEqual(len(results), 7)
+        for i, (subject, result) in enumerate(results):
+            self.assertEqual(subject, f"Hello name {i}")
+            self.assertEqual(
+                (subject, result), self.template.render_processed({"name": f"name {i}"})
+            )
+
+    def test_render_many__other_size_in_between(self):
+        items = [({"name": f"name {i}"}, None) for i in range(6)]
+        results = self.template.render_many(items, processes=2, chunk_size=1)
+        first = next(results)
+
+        # eg: another thread asks for another number of processes
+        other = list(self.template.render_many(items[:1], processes=1))
+
+        self.assertEqual(other[0][0], "Hello name 0")
+        self.assertEqual(
+            [subject for subject, _result in [first, *results]],
+            [f"Hello name {i}" for i in range(6)],
+        )
+
+    def test_render_many__idle_pools_are_shut_down(self):
+        items = [({"name": "name"}, None)]
+        list(self.template.render_many(items, processes=2))
+        first = pool._pools[(2, "spawn")][0]
+
+        list(self.template.render_many(items, processes=1))
+
+        # the last used pool is kept for the next batch
+        self.assertEqual(list(pool._pools), [(1, "spawn")])
+        with self.assertRaises(RuntimeError):
+            first.submit(print)
+
+    def test_build_many(self):
+        items = [
+            ([f"foo{i}@example.com"], {"name": f"name {i}"}, {"name": "subject"}, None)
+            for i in range(3)
+        ]
+
+        messages = list(self.template.build_many(items, processes=2, chunk_size=1))
+
+        self.assertEqual(
+            [message.to for message in messages],
+            [["foo0@example.com"], ["foo1@example.com"], ["foo2@example.com"]],
+        )
+        for i, message in enumerate(messages):
+            self.assertEqual(message.subject, "Hello subject")
+            html, content_type = message.alternatives[0]
+            self.assertIn(f"<p>name {i}</p>", html)
+            self.assertIn('href="http://testserver/foo"', html)
+            self.assertEqual(len(message.attachments), 1)
+
+    def test_send_mass(self):
+        items = [
+            ([f"foo{i}@example.com"], {"name": f"name {i}"}, None, None)
+            for i in range(3)
+        ]
+
+        with patch("mail_editor.models.Batch") as m:
+            res = self.template.send_mass(items, processes=2)
+
+        # nothing is rendered in this process
+        m.assert_not_called()
+        self.assertEqual(res, [1, 1, 1])
+        self.assertEqual(
+            [message.subject for message in mail.outbox],
+            ["Hello name 0", "Hello name 1", "Hello name 2"],
+        )
@@ -1,11 +1,16 @@
 import base64
 import os
+import shutil
+import tempfile
+from unittest.mock import patch
 
 from django.conf import settings
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from mail_editor import process
 from mail_editor.process import (
     cid_for_bytes,
+    clear_image_cache,
     load_image,
     make_url_absolute,
     read_data_uri,
@@ -32,6 +37,21 @@ class ProcessHelpersTestCase(TestCase):
                 "data:image/png;base64,xyz",
                 "data:image/png;base64,xyz",
             ),
+            # fast paths
+            ("http://example.com/", "/foo", "http://example.com/foo"),
+            ("http://example.com", "#top", "http://example.com/#top"),
+            ("", "#top", "/#top"),
+            (
+                "http://example.com",
+                "https://example.com/foo",
+                "https://example.com/foo",
+            ),
+            (
+                "http://example.com",
+                "//cdn.example.com/foo",
+                "http://example.com//cdn.example.com/foo",
+            ),
+            ("http://example.com", "/foo?next=http://bar", "/foo?next=http://bar"),
         ]
         for i, (base, url, expected) in enumerate(tests):
             with self.subTest((i, base, url)):
@@ -56,6 +76,43 @@ class ProcessHelpersTestCase(TestCase):
             data = read_image_file(path)
             self.assertIsNone(data)
 
+    def test_read_image_file__cached(self):
+        clear_image_cache()
+        self.addCleanup(clear_image_cache)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "logo.png")
+            shutil.copy(os.path.join(settings.STATIC_ROOT, "logo.png"), path)
+
+            data = read_image_file(path)
+            self.assertEqual(data.cid, cid_for_bytes(data.content))
+
+            with patch("mail_editor.process.open", create=True) as m:
+                self.assertEqual(read_image_file(path), data)
+            m.assert_not_called()
+
+            with self.subTest("changed file"):
+                with open(path, "wb") as f:
+                    f.write(b"changed")
+                os.utime(path, (1000, 1000))
+
+                data = read_image_file(path)
+                self.assertEqual(data.content, b"changed")
+                self.assertEqual(data.cid, cid_for_bytes(b"changed"))
+
+    @override_settings(MAIL_EDITOR_IMAGE_CACHE_SIZE=0)
+    def test_read_image_file__over_budget(self):
+        clear_image_cache()
+        self.addCleanup(clear_image_cache)
+        path = os.path.join(settings.STATIC_ROOT, "logo.png")
+
+        read_image_file(path)
+
+        with patch("mail_editor.process.open", create=True, wraps=open) as m:
+            data = read_image_file(path)
+        m.assert_called_once()
+        self.assertEqual(data.content_type, "image/png")
+
     def test_read_data_uri(self):
         path = os.path.join(settings.STATIC_ROOT, "logo.png")
         with open(path, "rb") as f:
@@ -73,6 +130,46 @@ class ProcessHelpersTestCase(TestCase):
             data = read_data_uri(datauri)
             self.assertIsNone(data)
 
+        with self.subTest("percent-encoded"):
+            datauri = "data:image/png;base64," + png_b64.replace("/", "%2F")
+            data = read_data_uri(datauri)
+            self.assertEqual(data.content, png_data)
+
+        with self.subTest("not base64"):
+            data = read_data_uri("data:text/plain;charset=utf8,foo%20bar")
+            self.assertEqual(data.content, b"foo bar")
+            self.assertEqual(data.content_type, "text/plain")
+
+        with self.subTest("no comma"):
+            self.assertIsNone(read_data_uri("data:image/png;base64"))
+
+        with self.subTest("non-ascii"):
+            self.assertIsNone(read_data_uri("data:text/plain,€"))
+
+    def test_read_data_uri__max_size(self):
+        clear_image_cache()
+        self.addCleanup(clear_image_cache)
+        datauri = "data:image/png;base64," + base64.b64encode(b"x" * 100).decode()
+
+        with override_settings(MAIL_EDITOR_DATA_URI_MAX_SIZE=99):
+            self.assertIsNone(read_data_uri(datauri))
+        with override_settings(MAIL_EDITOR_DATA_URI_MAX_SIZE=100):
+            self.assertEqual(read_data_uri(datauri).content, b"x" * 100)
+
+    def test_read_data_uri__cached(self):
+        clear_image_cache()
+        self.addCleanup(clear_image_cache)
+        datauri = "data:image/png;base64," + base64.b64encode(b"png").decode()
+
+        with patch(
+            "mail_editor.process._decode_data_uri",
+            wraps=process._decode_data_uri,
+        ) as m:
+            data = read_data_uri(datauri)
+            self.assertEqual(read_data_uri(datauri), data)
+        m.assert_called_once()
+        self.assertEqual(data.cid, cid_for_bytes(b"png"))
+
     def test_load_image(self):
         # TODO properly test both collected STATIC_ROOT and the development staticfiles.finders fallback
 
@@ -1,6 +1,8 @@
+import os
+import tempfile
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from mail_editor.process import FileData, process_html
 
@@ -121,3 +123,54 @@ class ProcessTestCase(TestCase):
         result = process_html(html, "https://example.com")
         self.assertHTMLEqual(result.html, expected_html)
         self.assertEqual(result.cid_attachments, [])
+
+    def test_inline_css_from_link__keeps_cascade_order(self):
+        html = """
+            <html>
+            <head>
+                <link href="/static/css/style.css" rel="stylesheet" type="text/css"/>
+                <style>h1 { color: blue; }</style>
+            </head>
+            <body>
+                <h1>foo</h1>
+            </body></html>
+        """
+        expected_html = """
+            <html><head></head><body>
+                <h1 style="color: blue;">foo</h1>
+            </body></html>
+        """
+        result = process_html(html, "https://example.com")
+        self.assertHTMLEqual(result.html, expected_html)
+
+    def test_inline_css_from_link__caches_stylesheet(self):
+        html = """
+            <html>
+            <head>
+                <link href="/static/css/style.css" rel="stylesheet" type="text/css"/>
+            </head>
+            <body>
+                <h1>foo</h1>
+            </body></html>
+        """
+        process_html(html, "https://example.com")
+
+        with patch("mail_editor.process.open", create=True) as m:
+            result = process_html(html, "https://example.com")
+
+        m.assert_not_called()
+        self.assertIn('<h1 style="color: red;">foo</h1>', result.html)
+
+    def test_inline_css_from_link__reloads_changed_stylesheet(self):
+        with tempfile.TemporaryDirectory() as static_root:
+            path = os.path.join(static_root, "mail.css")
+            html = '<html><head><link href="/static/mail.css" rel="stylesheet"></head><body><h1>foo</h1></body></html>'
+
+            with override_settings(STATIC_ROOT=static_root):
+                for mtime, color in [(1000, "red"), (2000, "blue")]:
+                    with open(path, "w") as f:
+                        f.write(f"h1 {{ color: {color}; }}")
+                    os.utime(path, (mtime, mtime))
+
+                    result = process_html(html, "https://example.com")
+                    self.assertIn(f'<h1 style="color: {color};">foo</h1>', result.html)
@@ -0,0 +1,104 @@
+from unittest.mock import Mock, patch
+
+from django.template import Template
+from django.test import TestCase, override_settings
+
+from mail_editor.models import MailTemplate
+from mail_editor.providers import get_variable_names
+
+order_provider = Mock(return_value="ORDER")
+flag_provider = Mock(return_value="FLAG")
+
+
+def get_user(context):
+    return "user of {}".format(context.get("id"))
+
+
+CONFIG = {
+    "template": {
+        "name": "template",
+        "subject": [
+            {"name": "user", "provider": "tests.test_providers.get_user"},
+        ],
+        "body": [
+            {"name": "order", "provider": order_provider},
+            {"name": "flag", "provider": flag_provider, "provider_ttl": 60},
+        ],
+    }
+}
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG)
+class ProvidersTestCase(TestCase):
+    def setUp(self):
+        order_provider.reset_mock()
+        flag_provider.reset_mock()
+        self.template = MailTemplate(
+            template_type="template",
+            subject="Hello {{ user }}",
+            body="<p>{{ order }}</p>",
+        )
+
+    def test_only_used_variables_are_provided(self):
+        subject, body = self.template.render({"id": "1"})
+
+        self.assertEqual(subject, "Hello user of 1")
+        self.assertIn("<p>ORDER</p>", body)
+        order_provider.assert_called_once()
+        flag_provider.assert_not_called()
+
+    def test_context_wins(self):
+        subject, body = self.template.render({"order": "GIVEN"})
+
+        self.assertIn("<p>GIVEN</p>", body)
+        order_provider.assert_not_called()
+
+    def test_resolved_once_per_render(self):
+        self.template.subject = "{{ order }}"
+        self.template.body = "{% if order %}{{ order }}{% endif %}"
+
+        subject, body = self.template.render({})
+
+        self.assertEqual(subject, "ORDER")
+        order_provider.assert_called_once()
+
+    def test_render_subject(self):
+        subject = self.template.render_subject({"id": "1"})
+
+        self.assertEqual(subject, "Hello user of 1")
+        order_provider.assert_not_called()
+
+    def test_batch(self):
+        self.template.body = "{{ order }} {{ flag }}"
+        items = [(["foo@example.com"], {"id": i}, None, None) for i in range(3)]
+
+        self.template.send_mass(items)
+
+        # per message
+        self.assertEqual(order_provider.call_count, 3)
+        # shared by the batch
+        flag_provider.assert_called_once()
+
+    def test_batch__ttl_expired(self):
+        self.template.body = "{{ flag }}"
+        items = [(["foo@example.com"], {"id": i}, None, None) for i in range(2)]
+
+        with patch("mail_editor.providers.time.monotonic", side_effect=[0, 100]):
+            self.template.send_mass(items)
+
+        self.assertEqual(flag_provider.call_count, 2)
+
+
+class VariableNamesTestCase(TestCase):
+    def test_variable_names(self):
+        template = Template(
+            "{{ a.b }} {{ c|default:d }} {{ 'literal' }}"
+            "{% if e and not f %}{% endif %}"
+            "{% for x in g %}{{ x }}{% endfor %}"
+            "{% with h=i %}{% endwith %}"
+        )
+
+        self.assertEqual(
+            get_variable_names(template),
+            {"a", "c", "d", "e", "f", "g", "x", "i"},
+        )
@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase, override_settings
+
+from mail_editor.models import MailTemplate
+from mail_editor.registry import get_registry
+from mail_editor.settings import get_choices, get_config
+from mail_editor.utils import variable_help_text
+
+CONFIG = {
+    "test_template": {
+        "name": "Test template",
+        "description": "Test description",
+        "subject": [{"name": "id", "description": "", "required": True}],
+        "body": [{"name": "name", "description": "The name", "example": "Jane"}],
+    }
+}
+
+
+class TemplateRegistryTestCase(SimpleTestCase):
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_built_once(self):
+        self.assertIs(get_registry(), get_registry())
+        self.assertIs(get_config(), get_config())
+
+        config = get_config()["test_template"]
+        self.assertEqual([var.name for var in config["subject"]], ["id"])
+        self.assertTrue(config["subject"][0].required)
+        self.assertEqual(config["body"][0].example, "Jane")
+
+    def test_rebuilt_on_setting_changed(self):
+        with override_settings(MAIL_EDITOR_CONF=CONFIG):
+            registry = get_registry()
+            self.assertEqual(get_choices(), [("test_template", "Test template")])
+
+        with override_settings(MAIL_EDITOR_CONF={"other": {}}):
+            self.assertIsNot(get_registry(), registry)
+            self.assertEqual(get_choices(), [("other", "Other")])
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_help_text(self):
+        help_text = variable_help_text("test_template")
+        self.assertIn("<li>*<b>id</b></li>", help_text)
+        self.assertIn('<li><b>name</b>: <i>The name</i> ("Jane")</li>', help_text)
+        self.assertIs(variable_help_text("test_template"), help_text)
+
+        self.assertEqual(
+            variable_help_text("unknown"),
+            "<ul></ul><br><br><label>Body variables:</label> <ul></ul>",
+        )
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_instance_config_is_lazy(self):
+        template = MailTemplate()
+        self.assertEqual(template.config, {})
+
+        template.template_type = "test_template"
+        self.assertIs(template.config, get_config()["test_template"])
+
+        template.config = {"subject": [], "body": []}
+        self.assertEqual(template.config, {"subject": [], "body": []})
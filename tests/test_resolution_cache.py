@@ -0,0 +1,155 @@
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from mail_editor.cache import invalidate_resolution_cache
+from mail_editor.models import MailTemplate
+
+CONFIG = {
+    "template": {"subject": [], "body": []},
+    "unused": {"subject": [], "body": []},
+}
+
+
+@override_settings(
+    MAIL_EDITOR_CONF=CONFIG,
+    MAIL_EDITOR_RESOLUTION_CACHE="local",
+    LANGUAGES=[("en", "English"), ("nl", "Dutch")],
+)
+class LocalResolutionCacheTestCase(TestCase):
+    def setUp(self):
+        invalidate_resolution_cache()
+        self.addCleanup(invalidate_resolution_cache)
+
+        self.fallback = MailTemplate.objects.create(
+            template_type="template", language="", subject="fallback", body="body"
+        )
+        self.dutch = MailTemplate.objects.create(
+            template_type="template", language="nl", subject="dutch", body="body"
+        )
+
+    def test_lookup_is_cached(self):
+        with self.assertNumQueries(2):
+            for _i in range(2):
+                self.assertEqual(
+                    MailTemplate.objects.get_for_language("template", "nl"), self.dutch
+                )
+                self.assertEqual(
+                    MailTemplate.objects.get_for_language("template", "en"),
+                    self.fallback,
+                )
+
+    def test_missing_is_cached(self):
+        with self.assertNumQueries(1):
+            for _i in range(2):
+                with self.assertRaises(MailTemplate.DoesNotExist):
+                    MailTemplate.objects.get_for_language("unused", "nl")
+
+    def test_cached_instances_are_copies(self):
+        template = MailTemplate.objects.get_for_language("template", "nl")
+        template.subject = "changed"
+
+        self.assertEqual(
+            MailTemplate.objects.get_for_language("template", "nl").subject, "dutch"
+        )
+
+    def test_save_and_delete_invalidate(self):
+        MailTemplate.objects.get_for_language("template", "en")
+
+        english = MailTemplate.objects.create(
+            template_type="template", language="en", subject="english", body="body"
+        )
+        self.assertEqual(
+            MailTemplate.objects.get_for_language("template", "en"), english
+        )
+
+        english.delete()
+        self.assertEqual(
+            MailTemplate.objects.get_for_language("template", "en"), self.fallback
+        )
+
+    def test_preload(self):
+        with self.assertNumQueries(1):
+            templates = MailTemplate.objects.preload()
+
+            self.assertEqual(templates, [self.fallback, self.dutch])
+            self.assertEqual(
+                MailTemplate.objects.get_for_language("template", "nl"), self.dutch
+            )
+            self.assertEqual(
+                MailTemplate.objects.get_for_language("template", "en"), self.fallback
+            )
+            with self.assertRaises(MailTemplate.DoesNotExist):
+                MailTemplate.objects.get_for_language("unused", "en")
+
+    def test_only_defers_fields(self):
+        with self.assertNumQueries(2):
+            for _i in range(2):
+                template = MailTemplate.objects.get_for_language(
+                    "template", "nl", only=["subject"]
+                )
+                self.assertEqual(template, self.dutch)
+                self.assertEqual(
+                    template.get_deferred_fields(),
+                    {"body", "remarks", "internal_name", "base_template_path"},
+                )
+
+        # full instances from the cache satisfy narrow lookups too
+        MailTemplate.objects.get_for_language("template", "nl")
+        with self.assertNumQueries(0):
+            template = MailTemplate.objects.get_for_language(
+                "template", "nl", only=["subject"]
+            )
+        self.assertEqual(template.body, "body")
+
+    @override_settings(MAIL_EDITOR_RESOLUTION_CACHE=None)
+    def test_disabled(self):
+        with self.assertNumQueries(2):
+            for _i in range(2):
+                MailTemplate.objects.get_for_language("template", "nl")
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG, MAIL_EDITOR_RESOLUTION_CACHE="default")
+class DjangoResolutionCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.template = MailTemplate.objects.create(
+            template_type="template", language="", subject="fallback", body="body"
+        )
+
+    def test_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            for _i in range(2):
+                self.assertEqual(
+                    MailTemplate.objects.get_for_language("template", "nl"),
+                    self.template,
+                )
+
+    def test_save_invalidates(self):
+        MailTemplate.objects.get_for_language("template", "nl")
+
+        self.template.subject = "changed"
+        self.template.save()
+
+        with self.assertNumQueries(1):
+            template = MailTemplate.objects.get_for_language("template", "nl")
+        self.assertEqual(template.subject, "changed")
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG, MAIL_EDITOR_UNIQUE_LANGUAGE_TEMPLATES=True)
+class UniqueLanguageTestCase(TestCase):
+    def test_clean_uses_single_query(self):
+        template = MailTemplate.objects.create(
+            template_type="template", language="nl", subject="dutch", body="body"
+        )
+
+        with self.assertNumQueries(1):
+            template.clean()
+
+        duplicate = MailTemplate(
+            template_type="template", language="nl", subject="dutch", body="body"
+        )
+        with self.assertRaises(ValidationError):
+            duplicate.clean()
@@ -1,13 +1,54 @@
 from base64 import b64encode
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
 from unittest.mock import patch
 
 from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
 from django.test import TestCase, override_settings
 from django.utils.translation import gettext_lazy as _
 
 from mail_editor.helpers import find_template
 from mail_editor.process import FileData
 
+
+class DisconnectingBackend(EmailBackend):
+    """
+    Drops the connection before sending to `drop_at`, like the SMTP backend the dead
+    connection is kept until it's closed.
+    """
+
+    def __init__(self, drop_at, refuse_reconnect=False, **kwargs):
+        super().__init__(**kwargs)
+        self.drop_at = drop_at
+        self.refuse_reconnect = refuse_reconnect
+        self.connection = None
+        self.alive = False
+        self.opened = 0
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        if self.opened and self.refuse_reconnect:
+            raise ConnectionRefusedError("Connection refused")
+        self.connection = object()
+        self.alive = True
+        self.opened += 1
+        return True
+
+    def close(self):
+        self.connection = None
+        self.alive = False
+
+    def send_messages(self, messages):
+        if messages[0].to == [self.drop_at]:
+            self.drop_at = None
+            self.alive = False
+        if not self.alive:
+            raise SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
 CONFIG = {
     "test_template": {
         "name": _("test_template"),
@@ -93,3 +134,128 @@ class EmailSendTestCase(TestCase):
         self.assertEqual(attach["Content-Type"], "image/jpg")
         payload = b64encode(b"abc").decode("utf8") + "\n"
         self.assertEqual(attach.get_payload(), payload)
+
+    @patch(
+        "mail_editor.process.load_image",
+        return_value=FileData(b"abc", "image/jpg"),
+        autospec=True,
+    )
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass(self, m):
+        template = find_template("process_template")
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(5)
+        ]
+
+        with patch("mail_editor.models.get_connection", wraps=get_connection) as conn:
+            res = template.send_mass(items, chunk_size=2)
+
+        self.assertEqual(res, [1, 1, 1, 1, 1])
+        conn.assert_called_once()
+        # the image is loaded once for the whole batch
+        m.assert_called_once()
+
+        self.assertEqual(len(mail.outbox), 5)
+        for i, message in enumerate(mail.outbox):
+            self.assertEqual(message.to, [f"foo{i}@example.com"])
+            self.assertEqual(message.subject, f"Important message for {i}")
+            self.assertEqual(len(message.attachments), 1)
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass__refused(self):
+        template = find_template("test_template")
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(3)
+        ]
+        connection = get_connection()
+        send_messages = connection.send_messages
+
+        def refuse_second(messages):
+            if messages[0].to == ["foo1@example.com"]:
+                raise SMTPRecipientsRefused({"foo1@example.com": (550, b"No")})
+            return send_messages(messages)
+
+        with patch.object(connection, "send_messages", side_effect=refuse_second):
+            with self.assertLogs("mail_editor.backends", "ERROR"):
+                res = template.send_mass(items, connection=connection)
+
+        self.assertEqual(res, [1, 0, 1])
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [["foo0@example.com"], ["foo2@example.com"]],
+        )
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass__disconnected(self):
+        template = find_template("test_template")
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(3)
+        ]
+        connection = DisconnectingBackend(drop_at="foo1@example.com")
+
+        res = template.send_mass(items, connection=connection)
+
+        self.assertEqual(res, [1, 1, 1])
+        self.assertEqual(connection.opened, 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass__disconnected_for_good(self):
+        template = find_template("test_template")
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(3)
+        ]
+        connection = DisconnectingBackend(
+            drop_at="foo1@example.com", refuse_reconnect=True
+        )
+
+        with self.assertLogs("mail_editor.models", "ERROR") as logs:
+            res = template.send_mass(items, connection=connection, fail_silently=True)
+
+        # the batch stops instead of failing every remaining message
+        self.assertEqual(res, [1])
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass__connection(self):
+        template = find_template("test_template")
+        items = [(["foo@example.com"], {"id": "1"}, None, None)]
+
+        connection = get_connection()
+        with (
+            patch.object(connection, "open", return_value=None),
+            patch.object(connection, "close") as close,
+        ):
+            # already open
+            template.send_mass(items, connection=connection)
+            close.assert_not_called()
+
+        with (
+            patch.object(connection, "open", return_value=True),
+            patch.object(connection, "close") as close,
+        ):
+            # opened by send_mass()
+            template.send_mass(items, connection=connection)
+            close.assert_called_once()
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_send_mass__attachments(self):
+        template = find_template("test_template")
+        items = [
+            (["foo@example.com"], {"id": "1"}, {"id": "subject"}, None),
+            (
+                ["bar@example.com"],
+                {"id": "2"},
+                None,
+                [("file.txt", "text", "text/plain")],
+            ),
+        ]
+
+        res = template.send_mass(items)
+
+        self.assertEqual(res, [1, 1])
+        self.assertEqual(mail.outbox[0].subject, "Important message for subject")
+        self.assertEqual(mail.outbox[0].attachments, [])
+        self.assertEqual(mail.outbox[1].subject, "Important message for 2")
+        self.assertEqual(mail.outbox[1].attachments[0][0], "file.txt")
@@ -0,0 +1,183 @@
+import socket
+import threading
+import time
+from smtplib import SMTPRecipientsRefused
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils.translation import gettext_lazy as _
+
+from aiosmtpd.controller import Controller
+from asgiref.sync import sync_to_async
+
+from mail_editor.backends import ThreadedEmailBackend
+from mail_editor.helpers import find_template
+from mail_editor.models import MailTemplate
+
+from .test_send import DisconnectingBackend
+
+CONFIG = {
+    "test_template": {
+        "name": _("test_template"),
+        "description": _("Test description"),
+        "subject_default": _("Important message for {{ id }}"),
+        "body_default": _("Test mail sent from testcase with {{ id }}"),
+        "subject": [{"name": "id", "description": ""}],
+        "body": [{"name": "id", "description": ""}],
+    },
+}
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return "250 OK"
+
+
+@override_settings(MAIL_EDITOR_CONF=CONFIG)
+class AsyncEmailSendTestCase(TestCase):
+    def setUp(self):
+        site_patch = patch("mail_editor.helpers.get_current_site")
+        site_patch.start()
+        self.addCleanup(patch.stopall)
+
+        self.template = find_template("test_template")
+
+    async def test_aget_for_language(self):
+        self.template.language = ""
+        await sync_to_async(self.template.save)()
+
+        template = await MailTemplate.objects.aget_for_language("test_template", "nl")
+        self.assertEqual(template, self.template)
+
+    async def test_asend_email(self):
+        res = await self.template.asend_email(["foo@example.com"], {"id": "111"})
+
+        self.assertEqual(res, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, _("Important message for 111"))
+        self.assertIn(str(_("Test mail sent from testcase with 111")), message.body)
+
+    async def test_asend_mass(self):
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(5)
+        ]
+
+        res = await self.template.asend_mass(
+            items, chunk_size=3, backend=ThreadedEmailBackend(concurrency=2)
+        )
+
+        self.assertEqual(res, [1, 1, 1, 1, 1])
+        self.assertEqual(
+            sorted(message.subject for message in mail.outbox),
+            [f"Important message for {i}" for i in range(5)],
+        )
+
+    async def test_concurrency_limit(self):
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        class SlowBackend(mail.backends.locmem.EmailBackend):
+            def send_messages(self, messages):
+                nonlocal in_flight, max_in_flight
+                with lock:
+                    in_flight += 1
+                    max_in_flight = max(max_in_flight, in_flight)
+                try:
+                    time.sleep(0.01)
+                    return super().send_messages(messages)
+                finally:
+                    with lock:
+                        in_flight -= 1
+
+        messages = [
+            await self.template.abuild_message([f"foo{i}@example.com"], {"id": i})
+            for i in range(6)
+        ]
+        with patch("mail_editor.backends.get_connection", return_value=SlowBackend()):
+            res = await ThreadedEmailBackend(concurrency=2).send_messages(messages)
+
+        self.assertEqual(res, [1] * 6)
+        self.assertEqual(max_in_flight, 2)
+
+    async def test_asend_mass__refused(self):
+        class RefusingBackend(mail.backends.locmem.EmailBackend):
+            def send_messages(self, messages):
+                if messages[0].to == ["foo2@example.com"]:
+                    raise SMTPRecipientsRefused({"foo2@example.com": (550, b"No")})
+                return super().send_messages(messages)
+
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(6)
+        ]
+        with (
+            patch(
+                "mail_editor.backends.get_connection",
+                side_effect=lambda **kwargs: RefusingBackend(),
+            ),
+            self.assertLogs("mail_editor.backends", "ERROR"),
+        ):
+            res = await self.template.asend_mass(
+                items, backend=ThreadedEmailBackend(concurrency=2)
+            )
+
+        self.assertEqual(res, [1, 1, 0, 1, 1, 1])
+        self.assertEqual(len(mail.outbox), 5)
+
+    async def test_asend_mass__disconnected(self):
+        backends = []
+
+        def get_connection(**kwargs):
+            backends.append(
+                DisconnectingBackend(drop_at="foo1@example.com", refuse_reconnect=True)
+            )
+            return backends[-1]
+
+        items = [
+            ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(4)
+        ]
+        with (
+            patch("mail_editor.backends.get_connection", side_effect=get_connection),
+            self.assertLogs("mail_editor.backends", "ERROR"),
+        ):
+            res = await self.template.asend_mass(
+                items, backend=ThreadedEmailBackend(concurrency=2)
+            )
+
+        # the worker that lost its connection stops, the other one sends the rest
+        self.assertEqual(res, [1, 0, 1, 1])
+        self.assertEqual(len(mail.outbox), 3)
+
+    async def test_smtp_stub(self):
+        handler = RecordingHandler()
+        controller = Controller(handler, hostname="127.0.0.1", port=get_free_port())
+        await sync_to_async(controller.start)()
+        self.addCleanup(controller.stop)
+
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=controller.port,
+        ):
+            items = [
+                ([f"foo{i}@example.com"], {"id": str(i)}, None, None) for i in range(3)
+            ]
+            res = await self.template.asend_mass(items)
+
+        self.assertEqual(res, [1, 1, 1])
+        self.assertEqual(
+            sorted(envelope.rcpt_tos[0] for envelope in handler.envelopes),
+            ["foo0@example.com", "foo1@example.com", "foo2@example.com"],
+        )
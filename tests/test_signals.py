@@ -0,0 +1,98 @@
+from django.test import TestCase, override_settings
+
+from mail_editor import signals
+from mail_editor.models import MailTemplate
+from mail_editor.process import process_html
+
+
+class PhaseFinishedTestCase(TestCase):
+    def setUp(self):
+        self.events = []
+        signals.phase_finished.connect(self.receiver)
+        self.addCleanup(signals.phase_finished.disconnect, self.receiver)
+
+        self.template = MailTemplate.objects.create(
+            template_type="template",
+            language="nl",
+            subject="Hello {{ name }}",
+            body='<p>{{ name }}</p><img src="/static/logo.png">',
+        )
+
+    def receiver(self, sender, **kwargs):
+        self.events.append((sender, kwargs))
+
+    def get_event(self, phase):
+        return next(
+            kwargs for _sender, kwargs in self.events if kwargs["phase"] == phase
+        )
+
+    def test_send_email(self):
+        MailTemplate.objects.get_for_language("template", "nl").send_email(
+            ["foo@example.com"], {"name": "Jane"}
+        )
+
+        phases = [kwargs["phase"] for _sender, kwargs in self.events]
+        self.assertEqual(
+            phases,
+            [
+                "lookup",
+                "base_context",
+                "render_subject",
+                "render",
+                "render_base_template",
+                "process_html.parse",
+                "process_html.absolutize",
+                "process_html.images",
+                "process_html.stylesheets",
+                "process_html.text",
+                "process_html.serialize",
+                "process_html.inline_css",
+                "mime",
+                "send",
+            ],
+        )
+        # the text is rendered from the tree, strip_tags() is only a fallback
+        self.assertEqual(set(phases), set(signals.PHASES) - {"strip_tags"})
+        for sender, kwargs in self.events:
+            self.assertIs(sender, MailTemplate)
+            self.assertEqual(kwargs["template_type"], "template")
+            self.assertEqual(kwargs["language"], "nl")
+            self.assertGreaterEqual(kwargs["duration"], 0)
+
+        self.assertEqual(
+            self.get_event("render")["html_size"],
+            len('<p>Jane</p><img src="/static/logo.png">'),
+        )
+        images = self.get_event("process_html.images")
+        self.assertEqual(images["attachments"], 1)
+        self.assertGreater(images["attachment_bytes"], 0)
+        self.assertEqual(self.get_event("mime")["attachments"], 1)
+        self.assertIsNone(self.get_event("send")["html_size"])
+
+    @override_settings(MAIL_EDITOR_TWO_PHASE_RENDERING=True)
+    def test_two_phase_rendering(self):
+        self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        parse = [
+            kwargs
+            for _sender, kwargs in self.events
+            if kwargs["phase"] == "process_html.parse"
+        ]
+        # the base template and the content
+        self.assertEqual(len(parse), 2)
+        self.assertEqual(parse[-1]["template_type"], "template")
+
+    def test_process_html_without_template(self):
+        process_html("<p>foo</p>", "http://testserver")
+
+        sender, kwargs = self.events[0]
+        self.assertIsNone(sender)
+        self.assertIsNone(kwargs["template_type"])
+
+
+class NoListenersTestCase(TestCase):
+    def test_timers_disabled(self):
+        self.assertIsNone(signals.start())
+        self.assertIsNone(signals.bind_template(MailTemplate()))
+        # no-op
+        signals.finish(None, "render")
@@ -0,0 +1,132 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import translation
+
+from mail_editor.models import MailTemplate
+from mail_editor.skeleton import build_skeleton, clear_skeletons
+
+
+class TwoPhaseRenderingTestCase(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+
+        os.makedirs(os.path.join(self.tempdir.name, "templates"))
+        os.makedirs(os.path.join(self.tempdir.name, "static"))
+        with open(os.path.join(self.tempdir.name, "templates", "base.html"), "w") as f:
+            f.write(
+                '<html><head><link href="/static/mail.css" rel="stylesheet"></head>'
+                '<body><div class="wrap">{{ content }}</div><img src="/static/logo.png">'
+                "</body></html>"
+            )
+        self.stylesheet = os.path.join(self.tempdir.name, "static", "mail.css")
+        self.write_stylesheet("p { color: red; }", mtime=1000)
+
+        settings_patch = override_settings(
+            TEMPLATES=[
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "DIRS": [os.path.join(self.tempdir.name, "templates")],
+                    "APP_DIRS": True,
+                }
+            ],
+            STATICFILES_DIRS=[os.path.join(self.tempdir.name, "static")],
+            MAIL_EDITOR_TWO_PHASE_RENDERING=True,
+        )
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
+        clear_skeletons()
+        self.addCleanup(clear_skeletons)
+
+        self.template = MailTemplate(
+            template_type="template",
+            subject="Hello {{ name }}",
+            body='<p>{{ name }}</p><img src="/static/logo.png">',
+            base_template_path="base.html",
+        )
+
+    def write_stylesheet(self, css, mtime):
+        with open(self.stylesheet, "w") as f:
+            f.write(css)
+        os.utime(self.stylesheet, (mtime, mtime))
+
+    def test_content_is_spliced_in_processed_base_template(self):
+        message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        self.assertEqual(message.subject, "Hello Jane")
+        html, content_type = message.alternatives[0]
+        self.assertIn('<div class="wrap"><p style="color: red;">Jane</p>', html)
+        self.assertNotIn("<link", html)
+        # the logo in the base template and in the content share one attachment
+        self.assertEqual(html.count('<img src="cid:'), 2)
+        self.assertEqual(len(message.attachments), 1)
+        self.assertIn("Jane", message.body)
+
+    def test_skeleton_is_reused(self):
+        with patch("mail_editor.skeleton.build_skeleton", wraps=build_skeleton) as m:
+            self.template.build_message(["foo@example.com"], {"name": "Jane"})
+            message = self.template.build_message(["bar@example.com"], {"name": "Joe"})
+
+        m.assert_called_once()
+        html, content_type = message.alternatives[0]
+        self.assertIn('<p style="color: red;">Joe</p>', html)
+
+    def test_changed_stylesheet_rebuilds_skeleton(self):
+        self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        self.write_stylesheet("p { color: blue; }", mtime=2000)
+        message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        html, content_type = message.alternatives[0]
+        self.assertIn('<p style="color: blue;">Jane</p>', html)
+
+    def test_skeleton_per_language(self):
+        with open(os.path.join(self.tempdir.name, "templates", "i18n.html"), "w") as f:
+            f.write(
+                "{% load i18n %}{% get_current_language as lang %}"
+                "<html><body><p>lang={{ lang }}</p>{{ content }}</body></html>"
+            )
+        self.template.base_template_path = "i18n.html"
+
+        with translation.override("nl"):
+            message = self.template.build_message(["foo@example.com"], {"name": "Jan"})
+        self.assertIn("lang=nl", message.alternatives[0][0])
+
+        with translation.override("en"):
+            message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+        html, content_type = message.alternatives[0]
+        self.assertIn("lang=en", html)
+        self.assertNotIn("lang=nl", html)
+
+    def test_falls_back_without_content_placeholder(self):
+        self.template.base_template_path = "mail/_outer_table.html"
+
+        message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        html, content_type = message.alternatives[0]
+        self.assertIn("<table", html)
+        self.assertNotIn("Jane", html)
+        self.assertNotIn("mail-editor-content", html)
+
+    def test_text_includes_base_template(self):
+        with open(
+            os.path.join(self.tempdir.name, "templates", "footer.html"), "w"
+        ) as f:
+            f.write(
+                "<html><body><h1>News</h1><div>{{ content }}</div>"
+                '<p>Unsubscribe <a href="/unsubscribe">here</a></p></body></html>'
+            )
+        self.template.base_template_path = "footer.html"
+
+        message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+
+        expected = "News\n\nJane\n\nUnsubscribe here (http://testserver/unsubscribe)"
+        self.assertEqual(message.body, expected)
+
+        with override_settings(MAIL_EDITOR_TWO_PHASE_RENDERING=False):
+            message = self.template.build_message(["foo@example.com"], {"name": "Jane"})
+        self.assertEqual(message.body, expected)
@@ -0,0 +1,209 @@
+import datetime
+from collections import ChainMap, defaultdict
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy as _
+
+from mail_editor.cache import compiled_templates
+from mail_editor.models import MailTemplate
+from mail_editor.substitution import (
+    SubstitutionTemplate,
+    compile_substitution,
+    render_template,
+)
+
+
+class Thing(object):
+    name = "thing <b>"
+    items = ["first", "second"]
+
+    def method(self):
+        return "called"
+
+    def needs_args(self, arg):
+        return arg
+
+    def delete(self):
+        raise AssertionError("called")
+
+    delete.alters_data = True
+
+    @property
+    def broken(self):
+        raise AttributeError("broken property")
+
+    def __str__(self):
+        return "Thing & co"
+
+
+class Uncalled(object):
+    do_not_call_in_templates = True
+
+    def __call__(self):
+        raise AssertionError("called")
+
+    def __str__(self):
+        return "uncalled"
+
+
+class SilentError(Exception):
+    silent_variable_failure = True
+
+
+def silent():
+    raise SilentError()
+
+
+def loud():
+    raise ValueError("loud")
+
+
+CONTEXT = {
+    "text": "plain",
+    "html": "<script>alert('x') & \"y\"</script>",
+    "safe": mark_safe("<b>safe</b>"),
+    "lazy": _("Test description"),
+    "number": 1234,
+    "float": 1234.5,
+    "decimal": Decimal("12.50"),
+    "date": datetime.date(2024, 1, 31),
+    "none": None,
+    "empty": "",
+    "nested": {"a": {"b": "deep"}, "0": "zero key", "items": "key wins"},
+    "list": ["first", "second"],
+    "thing": Thing(),
+    "method": Thing().method,
+    "uncalled": Uncalled(),
+    "silent": silent,
+    "default": defaultdict(lambda: "default"),
+    "unicode": "€ — ü",
+}
+
+TEMPLATES = [
+    "",
+    "only text",
+    "{{ text }}",
+    "Hello {{ text }}, {{ html }} {{ safe }}",
+    "{{ lazy }}",
+    "{{ number }} {{ float }} {{ decimal }} {{ date }}",
+    "{{ none }}|{{ empty }}|{{ missing }}|{{ missing.attr }}",
+    "{{ True }} {{ False }} {{ None }}",
+    "{{ nested.a.b }} {{ nested.0 }} {{ nested.items }} {{ nested.missing }}",
+    "{{ list.0 }} {{ list.1 }} {{ list.2 }} {{ list.foo }}",
+    "{{ thing }} {{ thing.name }} {{ thing.items.1 }} {{ thing.method }}",
+    "{{ thing.needs_args }}|{{ thing.delete }}|{{ thing.missing }}",
+    "{{ method }} {{ uncalled }} {{ silent }}",
+    "{{ default.foo }}",
+    "{# comment #}{{ text }}",
+    "{{ unicode }}\n<p>{{ text }}</p>\n",
+]
+
+
+class DifferentialTestCase(SimpleTestCase):
+    """
+    The substitution renderer must produce exactly what Django produces.
+    """
+
+    def assertSameOutput(self, source, context):
+        template = Template(source)
+        compiled = compile_substitution(template)
+        self.assertIsInstance(compiled, SubstitutionTemplate)
+
+        layers = ChainMap({}, context)
+        expected = template.render(Context(layers.new_child()))
+        output = render_template(compiled, layers)
+
+        self.assertEqual(output, expected)
+        self.assertEqual(type(output), type(expected))
+
+    def test_same_output(self):
+        for source in TEMPLATES:
+            with self.subTest(source):
+                self.assertSameOutput(source, CONTEXT)
+
+    @override_settings(LANGUAGE_CODE="nl", USE_THOUSAND_SEPARATOR=True)
+    def test_same_output__localized(self):
+        self.assertSameOutput(
+            "{{ number }} {{ float }} {{ decimal }} {{ date }}", CONTEXT
+        )
+
+    def test_same_output__repeated_variables(self):
+        source = (
+            "{{ html }} {{ counter }} {{ html }} {{ counter }} {{ safe }} {{ safe }}"
+        )
+        template = Template(source)
+        compiled = compile_substitution(template)
+
+        def get_context():
+            # called for every occurrence
+            count = iter(range(1, 10))
+            return ChainMap(
+                {
+                    "html": "<b>",
+                    "safe": mark_safe("<b>"),
+                    "counter": lambda: next(count),
+                }
+            )
+
+        expected = template.render(Context(get_context().new_child()))
+        self.assertEqual(render_template(compiled, get_context()), expected)
+        self.assertEqual(expected, "&lt;b&gt; 1 &lt;b&gt; 2 <b> <b>")
+
+    def test_same_errors(self):
+        for source, context in [
+            ("{{ thing.broken }}", {"thing": Thing()}),
+            ("{{ loud }}", {"loud": loud}),
+        ]:
+            with self.subTest(source):
+                template = Template(source)
+                compiled = compile_substitution(template)
+                layers = ChainMap(context)
+                with self.assertRaises(Exception) as expected:
+                    template.render(Context(layers.new_child()))
+                with self.assertRaises(type(expected.exception)):
+                    render_template(compiled, layers)
+
+    def test_not_substituted(self):
+        for source in [
+            "{{ text|upper }}",
+            "{% if text %}{{ text }}{% endif %}",
+            "{% load i18n %}{% trans 'foo' %}",
+            "{{ 'literal' }}",
+            "{{ 1 }}",
+            '{{ _("translated") }}',
+        ]:
+            with self.subTest(source):
+                template = Template(source)
+                self.assertIs(compile_substitution(template), template)
+
+    def test_string_if_invalid(self):
+        engine_patch = patch.object(Template("").engine, "string_if_invalid", "INVALID")
+        with engine_patch:
+            template = Template("{{ missing }}")
+            self.assertIs(compile_substitution(template), template)
+
+
+class MailTemplateTestCase(TestCase):
+    def setUp(self):
+        compiled_templates.clear()
+        self.addCleanup(compiled_templates.clear)
+
+    def test_render(self):
+        template = MailTemplate(
+            template_type="template",
+            subject="Hello {{ name }}",
+            body="{% if name %}<p>{{ name }}</p>{% endif %}",
+        )
+
+        subject, body = template.render({"name": "<Jane>"})
+
+        self.assertEqual(subject, "Hello &lt;Jane&gt;")
+        self.assertIn("<p>&lt;Jane&gt;</p>", body)
+        self.assertIsInstance(
+            compiled_templates.get(None, template.subject), SubstitutionTemplate
+        )
+        self.assertIsInstance(compiled_templates.get(None, template.body), Template)
@@ -5,6 +5,7 @@ from django.test import TestCase, override_settings
 from django.utils.translation import gettext_lazy as _
 
 from mail_editor.helpers import find_template
+from mail_editor.utils import clear_site_domain, get_site_domain
 
 CONFIG = {
     "test_template": {
@@ -112,3 +113,98 @@ class TemplateRenderTestCase(TestCase):
         # rendered placeholder
         self.assertEqual(subject, "Important message for --id--")
         self.assertIn("Test mail sent from testcase with --id--", body)
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_context_is_not_copied(self):
+        class NoCopy(object):
+            def __str__(self):
+                return "no copy"
+
+            def __deepcopy__(self, memo):
+                raise AssertionError("deep copied")
+
+        template = find_template("test_template")
+        template.body = "{{ id }} {{ base }}"
+
+        with override_settings(MAIL_EDITOR_BASE_CONTEXT={"base": NoCopy()}):
+            subject, body = template.render({"id": NoCopy()})
+
+        self.assertEqual(subject, "Important message for no copy")
+        self.assertIn("no copy no copy", body)
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG, MAIL_EDITOR_BASE_CONTEXT={"id": "BASE"})
+    def test_template_variables_dont_leak(self):
+        template = find_template("test_template")
+        template.subject = "{{ id }} {{ foo }}"
+        template.body = '{% firstof "body" as foo %}{{ foo }}'
+        context = {"id": "111"}
+
+        subject, body = template.render(context)
+
+        self.assertEqual(subject, "111 ")
+        self.assertIn("body", body)
+        self.assertEqual(context, {"id": "111"})
+        self.assertEqual(template.get_base_context()["id"], "BASE")
+
+    def test_base_context_update(self):
+        template = find_template("test_template")
+        base = {"a": 1}
+
+        with override_settings(MAIL_EDITOR_BASE_CONTEXT=base):
+            template.get_base_context().update(leak="yes")
+            with override_settings(
+                MAIL_EDITOR_DYNAMIC_CONTEXT="tests.test_template_rendering.dynamic_context"
+            ):
+                context = template.get_base_context()
+                context.update(leak="yes")
+                self.assertEqual(context["leak"], "yes")
+                self.assertNotIn("leak", template.get_base_context())
+
+        self.assertEqual(base, {"a": 1})
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_render_subject(self):
+        template = find_template("test_template")
+
+        with (
+            patch("mail_editor.models.import_string") as loader,
+            patch.object(template, "_render_partial_body") as render_body,
+        ):
+            subject = template.render_subject({"id": "111"})
+            self.assertEqual(subject, "Important message for 111")
+
+            subject = template.render_subject({"id": "111"}, {"id": "222"})
+            self.assertEqual(subject, "Important message for 222")
+
+        # nothing else is rendered
+        loader.assert_not_called()
+        render_body.assert_not_called()
+
+    @override_settings(MAIL_EDITOR_CONF=CONFIG)
+    def test_render_body(self):
+        template = find_template("test_template")
+
+        with patch.object(template, "_render_subject") as render_subject:
+            body = template.render_body({"id": "111"})
+
+        render_subject.assert_not_called()
+        self.assertIn("Test mail sent from testcase with 111", body)
+        self.assertEqual(body, template.render({"id": "111"})[1])
+
+
+class SiteDomainTestCase(TestCase):
+    def setUp(self):
+        clear_site_domain()
+        self.addCleanup(clear_site_domain)
+
+    @patch("mail_editor.utils.get_current_site")
+    def test_domain_is_cached(self, m):
+        m.return_value.domain = "example.com"
+
+        self.assertEqual(get_site_domain(), "example.com")
+        self.assertEqual(get_site_domain(), "example.com")
+        m.assert_called_once_with(None)
+
+        with override_settings(SITE_ID=2):
+            m.return_value.domain = "other.example.com"
+            self.assertEqual(get_site_domain(), "other.example.com")
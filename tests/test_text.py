@@ -0,0 +1,129 @@
+from django.test import SimpleTestCase
+
+from lxml import etree
+
+from mail_editor.models import MailTemplate
+from mail_editor.process import ProcessedHTML, process_fragment, process_html
+from mail_editor.text import PLACEHOLDER_MARKER, html_to_text
+
+
+def to_text(html, **kwargs):
+    return html_to_text(etree.fromstring(html, etree.HTMLParser()), **kwargs)
+
+
+class HTMLToTextTestCase(SimpleTestCase):
+    def test_text(self):
+        tests = [
+            ("<p>foo</p><p>bar</p>", "foo\n\nbar"),
+            ("<p>  foo\n   <b>bar</b>\tbaz </p>", "foo bar baz"),
+            ("<div>foo</div><div>bar</div>", "foo\nbar"),
+            ("<h1>Title</h1>text", "Title\n\ntext"),
+            ("<p>foo<br>bar<br><br>baz</p>", "foo\nbar\n\nbaz"),
+            ("<p>a&nbsp;&amp;&nbsp;b</p>", "a\xa0&\xa0b"),
+            ("<pre>  foo\n    bar</pre>", "  foo\n    bar"),
+            ("<p>foo</p><hr><p>bar</p>", "foo\n\n" + "-" * 20 + "\n\nbar"),
+            ("<img src='x.png' alt='Logo'> text", "Logo text"),
+            (
+                "<head><title>Title</title><style>p {}</style></head>"
+                "<body><script>alert()</script><!-- comment -->foo</body>",
+                "foo",
+            ),
+        ]
+        for html, expected in tests:
+            with self.subTest(html):
+                self.assertEqual(to_text(html), expected)
+
+    def test_links(self):
+        tests = [
+            (
+                '<a href="https://example.com/foo">foo</a>',
+                "foo (https://example.com/foo)",
+            ),
+            (
+                '<a href="https://example.com">https://example.com</a>',
+                "https://example.com",
+            ),
+            ('<a href="https://example.com"><img src="x"></a>', "https://example.com"),
+            (
+                '<a href="mailto:info@example.com">mail us</a>',
+                "mail us (info@example.com)",
+            ),
+            (
+                '<a href="mailto:info@example.com">info@example.com</a>',
+                "info@example.com",
+            ),
+            ('<a href="tel:123">call</a>', "call (123)"),
+            ('<a href="javascript:void(0)">foo</a>', "foo"),
+            ("<a>foo</a>", "foo"),
+        ]
+        for html, expected in tests:
+            with self.subTest(html):
+                self.assertEqual(to_text(html), expected)
+
+    def test_lists(self):
+        html = """
+            <p>intro</p>
+            <ul>
+                <li>one</li>
+                <li>two
+                    <ol start="3"><li>three</li><li>four</li></ol>
+                </li>
+            </ul>
+            <p>outro</p>
+        """
+        self.assertEqual(
+            to_text(html), "intro\n\n- one\n- two\n  3. three\n  4. four\n\noutro"
+        )
+
+    def test_tables(self):
+        html = """
+            <table>
+                <tr><th>Product</th><th>Price</th></tr>
+                <tr><td>Foo</td><td>&euro; 10</td><td>&nbsp;</td></tr>
+            </table>
+            <table>
+                <tr><td><p>Layout</p><p>tables</p></td></tr>
+                <tr><td>footer</td></tr>
+            </table>
+        """
+        self.assertEqual(
+            to_text(html),
+            "Product | Price\nFoo | € 10\n\nLayout\n\ntables\n\nfooter",
+        )
+
+    def test_placeholder(self):
+        html = "<p>head</p><div><!--content--></div><p>tail</p>"
+
+        self.assertEqual(to_text(html), "head\n\ntail")
+        self.assertEqual(
+            to_text(html, placeholder="content"),
+            f"head\n\n{PLACEHOLDER_MARKER}\n\ntail",
+        )
+
+
+class ProcessTextTestCase(SimpleTestCase):
+    def test_process_html(self):
+        html = """
+            <html><head><style>p { color: red; }</style></head><body>
+                <p>Hello <a href="/foo">foo</a></p>
+            </body></html>
+        """
+        result = process_html(html, "https://example.com", extract_attachments=False)
+        self.assertEqual(result.text, "Hello foo (https://example.com/foo)")
+
+        result = process_html(html, "https://example.com", extract_text=False)
+        self.assertIsNone(result.text)
+
+    def test_process_fragment(self):
+        result = process_fragment(
+            "<p>Hello</p><ul><li>foo</li></ul>",
+            "https://example.com",
+            css="p { color: red; }",
+        )
+        self.assertEqual(result.text, "Hello\n\n- foo")
+
+    def test_build_message_falls_back_to_strip_tags(self):
+        message = MailTemplate(template_type="template")._create_message(
+            "subject", ProcessedHTML("<p>foo <b>bar</b></p>", []), ["foo@example.com"]
+        )
+        self.assertEqual(message.body, "foo bar")
@@ -0,0 +1,155 @@
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from mail_editor import process
+from mail_editor.cache import compiled_templates
+from mail_editor.models import MailTemplate
+from mail_editor.process import clear_image_cache
+from mail_editor.skeleton import clear_skeletons
+from mail_editor.warmup import start_warmup, warm_up
+
+
+class WarmupTestCase(TestCase):
+    def setUp(self):
+        compiled_templates.clear()
+        clear_image_cache()
+        clear_skeletons()
+        process._stylesheets.clear()
+        self.addCleanup(compiled_templates.clear)
+
+        self.template = MailTemplate.objects.create(
+            template_type="template",
+            subject="Hello {{ foo }}",
+            body=(
+                '<link href="/static/css/style.css" rel="stylesheet" type="text/css"/>'
+                '<p>{{ bar }}</p><img src="/static/logo.png">'
+            ),
+        )
+
+    def test_warm_up(self):
+        with self.assertNumQueries(1):
+            report = warm_up()
+
+        self.assertEqual(report.templates, 1)
+        self.assertEqual(report.compiled, 2)
+        self.assertEqual(report.errors, [])
+        # only used with two-phase rendering
+        self.assertEqual(report.skeletons, 0)
+        self.assertEqual(report.stylesheets, 1)
+        self.assertEqual(report.images, 1)
+        self.assertGreater(report.memory, 0)
+        self.assertEqual(len(compiled_templates), 2)
+
+        # rendering uses the compiled templates
+        with patch("mail_editor.engines.Template") as m:
+            MailTemplate.objects.get(pk=self.template.pk).render({})
+        m.assert_not_called()
+
+    def test_warm_up__base_template(self):
+        self.template.body = "<p>{{ bar }}</p>"
+        self.template.base_template_path = "base.html"
+        self.template.save()
+
+        with TemporaryDirectory() as tempdir:
+            with open(os.path.join(tempdir, "base.html"), "w") as f:
+                f.write(
+                    '<html><head><link href="/static/css/style.css" rel="stylesheet">'
+                    '</head><body>{{ content }}<img src="/static/logo.png"></body></html>'
+                )
+            templates = [
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "DIRS": [tempdir],
+                }
+            ]
+            with override_settings(TEMPLATES=templates):
+                clear_image_cache()
+                process._stylesheets.clear()
+                report = warm_up(measure_memory=False)
+
+        # without two-phase rendering the base template is processed too
+        self.assertEqual(report.base_templates, 1)
+        self.assertEqual(report.skeletons, 0)
+        self.assertEqual(report.stylesheets, 1)
+        self.assertEqual(report.images, 1)
+
+    @override_settings(MAIL_EDITOR_TWO_PHASE_RENDERING=True)
+    def test_warm_up__two_phase_rendering(self):
+        report = warm_up(measure_memory=False)
+
+        self.assertEqual(report.skeletons, 1)
+
+    @override_settings(DEBUG=True)
+    def test_warm_up__processing_error(self):
+        MailTemplate.objects.create(
+            template_type="template", subject="{{ foo }}", body="{{ bar }}"
+        )
+
+        with patch(
+            "mail_editor.warmup.process_fragment",
+            side_effect=[ValueError("invalid"), None],
+        ):
+            report = warm_up(measure_memory=False)
+
+        self.assertEqual(report.templates, 2)
+        self.assertEqual(report.compiled, 4)
+        self.assertEqual(len(report.errors), 1)
+        self.assertIn("invalid", report.errors[0])
+
+    def test_warm_up__syntax_error(self):
+        MailTemplate.objects.create(
+            template_type="template", subject="{{ foo bar }}", body="{{ bar }}"
+        )
+
+        report = warm_up(measure_memory=False)
+
+        self.assertEqual(report.templates, 2)
+        self.assertEqual(report.compiled, 3)
+        self.assertEqual(len(report.errors), 1)
+        self.assertIsNone(report.memory)
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command("mail_editor_warmup", stdout=stdout)
+
+        self.assertIn("Warmed up 1 template(s), 2 compiled", stdout.getvalue())
+        self.assertIn("KiB", stdout.getvalue())
+
+    def test_ready(self):
+        config = apps.get_app_config("mail_editor")
+
+        with patch("mail_editor.warmup.start_warmup") as start_mock:
+            config.ready()
+            start_mock.assert_not_called()
+
+            with override_settings(MAIL_EDITOR_WARMUP=True):
+                config.ready()
+            start_mock.assert_called_once()
+
+    @override_settings(MAIL_EDITOR_WARMUP=True)
+    def test_ready__management_command(self):
+        config = apps.get_app_config("mail_editor")
+
+        with patch("mail_editor.warmup.start_warmup") as start_mock:
+            with patch("sys.argv", ["manage.py", "migrate"]):
+                config.ready()
+            start_mock.assert_not_called()
+
+            with patch("sys.argv", ["manage.py", "runserver"]):
+                config.ready()
+            start_mock.assert_called_once()
+
+    def test_start_warmup(self):
+        with patch("mail_editor.warmup.warm_up") as warm_up_mock:
+            # the connections of the thread are closed, the test database must stay open
+            with patch("mail_editor.warmup.connections"):
+                start_warmup().join()
+
+        warm_up_mock.assert_called_once_with(measure_memory=False)